@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Performance baselines for the generator and inference hot paths.
+
+Every case runs in a fresh (spawned) interpreter, so its peak RSS is its
+own, on a fixed‑seed subset of the symbols and context images::
+
+    place_alpha        µs per composite for a small, a median and a large symbol
+                       (and the large one alpha-blended)
+    generate_image     images/s and placement probes/scans per symbol
+    lableing_main      end‑to‑end ``lableing.main`` incl. encode/write stages
+    yolo_predict       CPU ms per image at batch 1/8/32 (skipped if
+                       ultralytics or the weights are missing)
+
+Results are written as JSON and compared against a stored baseline; a
+metric that is worse than the baseline by more than ``--tolerance`` is
+flagged and the exit status is 1::
+
+    python benchmark.py --save-baseline        # record benchmark_baseline.json
+    python benchmark.py                        # compare, write benchmark_results.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import lableing
+
+# ---------------------------------------------------------------------------
+# 1. Configuration
+# ---------------------------------------------------------------------------
+
+SEED = 0
+SUBSET_SYMBOLS = 16             # symbols drawn (with SEED) from GROUND_TRUTH_DIR
+SUBSET_CONTEXTS = 4
+GENERATE_IMAGES = 50
+MAIN_IMAGES = 64
+PREDICT_IMAGES = 64
+PREDICT_BATCHES = (1, 8, 32)
+TOLERANCE = 0.15                # relative slack before a metric counts as a regression
+
+RESULTS = Path("benchmark_results.json")
+BASELINE = Path("benchmark_baseline.json")
+
+# +1: higher is better, -1: lower is better; other metrics are informational
+DIRECTION = {
+    "us_per_call": -1,
+    "images_per_s": +1,
+    "ms_per_image": -1,
+    "probes_per_symbol": -1,
+    "scans_per_symbol": -1,
+    "peak_rss_mb": -1,
+}
+
+# ---------------------------------------------------------------------------
+# 2. Fixed asset subset
+# ---------------------------------------------------------------------------
+
+def _link_subset(src: Path, dst: Path, k: int, rng: random.Random):
+    dst.mkdir(parents=True, exist_ok=True)
+    files = lableing.image_files(src)
+    for p in sorted(rng.sample(files, min(k, len(files)))):
+        (dst / p.name).symlink_to(p.resolve())
+    return dst
+
+def asset_subset(root: Path, seed=SEED, symbols=SUBSET_SYMBOLS, contexts=SUBSET_CONTEXTS):
+    """Link a seeded subset of the assets into *root*; return ``(symbol_dir, context_dir)``."""
+    rng = random.Random(seed)
+    return (_link_subset(lableing.GROUND_TRUTH_DIR, root / "symbols", symbols, rng),
+            _link_subset(lableing.CONTEXT_DIR, root / "contexts", contexts, rng))
+
+def subset_generator(root: Path):
+    symbol_dir, context_dir = asset_subset(root)
+    return lableing.SyntheticGenerator(symbol_dir, context_dir, asset_cache=None).load()
+
+# ---------------------------------------------------------------------------
+# 3. Cases (each returns a flat dict of metrics)
+# ---------------------------------------------------------------------------
+
+def _best_of(fn, number, repeat=5):
+    """Minimum seconds per call over *repeat* runs of *number* calls."""
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - t) / number)
+    return best
+
+def bench_place_alpha(root: Path):
+    gen = subset_generator(root)
+    sprites = sorted((s for _, s in gen.symbols), key=lambda s: s.h * s.w)
+    canvas = gen.new_canvas()
+    canvas[...] = gen.background
+    large = sprites[-1]
+    # most symbols are opaque; an alpha ramp over the largest one times the blend path
+    ramp = np.linspace(1, 254, large.w, dtype=np.uint8)[None, :, None].repeat(large.h, 0)
+    blend = lableing.Sprite(np.concatenate([large.bgr, ramp], axis=2))
+    out = {}
+    for name, s in (("small", sprites[0]), ("median", sprites[len(sprites) // 2]),
+                    ("large", large), ("large_blend", blend)):
+        sec = _best_of(lambda: lableing.place_alpha(canvas, s, (0, 0)), number=200)
+        out[f"{name}.size"] = f"{s.w}x{s.h} {s.mode}"
+        out[f"{name}.us_per_call"] = round(sec * 1e6, 2)
+    return out
+
+def bench_generate_image(root: Path):
+    gen = subset_generator(root)
+    canvas = gen.new_canvas()
+    gen.generate(random.Random(lableing.image_seed(SEED, 0)), out=canvas)  # warm-up
+    probes = scans = symbols = 0
+    t = time.perf_counter()
+    for i in range(GENERATE_IMAGES):
+        stats = {}
+        gen.generate(random.Random(lableing.image_seed(SEED, i)), stats, out=canvas)
+        probes += stats["probes"]
+        scans += stats["scans"]
+        symbols += stats["symbols_placed"] + stats["symbols_failed"] \
+            + stats["contexts_placed"] + stats["contexts_failed"]
+    wall = time.perf_counter() - t
+    return {
+        "images_per_s": round(GENERATE_IMAGES / wall, 2),
+        "probes_per_symbol": round(probes / symbols, 3),
+        "scans_per_symbol": round(scans / symbols, 3),
+    }
+
+def bench_lableing_main(root: Path):
+    symbol_dir, context_dir = asset_subset(root)
+    out = root / "out"
+    argv = ["--symbols", str(symbol_dir), "--contexts", str(context_dir), "--no-asset-cache",
+            "--out-images", str(out / "images"), "--out-labels", str(out / "labels"),
+            "--manifest", str(out / "manifest.json"), "--dataset-yaml", str(out / "dataset.yaml"),
+            "-n", str(MAIN_IMAGES), "-j", "1", "--seed", str(SEED)]
+    t = time.perf_counter()
+    totals = lableing.main(argv)
+    wall = time.perf_counter() - t
+    n = totals["images"]
+    return {
+        "images_per_s": round(n / wall, 2),
+        "compose.images_per_s": round(n / totals["compose"], 2),
+        "encode.images_per_s": round(n / totals["encode"], 2),
+        "write.images_per_s": round(n / totals["write"], 2),
+        "mib_written": round(totals["bytes"] / 2**20, 2),
+    }
+
+def bench_yolo_predict(root: Path):
+    try:
+        import yolo_predict
+    except ImportError as exc:
+        return {"skipped": f"yolo_predict unavailable: {exc}"}
+    weights = Path(yolo_predict.WEIGHTS)
+    if not weights.exists():
+        return {"skipped": f"{weights} not found"}
+    model = yolo_predict.load_model(weights)
+    paths = (yolo_predict.iter_image_paths(["cropped_enhanced"]) * PREDICT_IMAGES)[:PREDICT_IMAGES]
+    images = [cv2.imread(str(p), cv2.IMREAD_COLOR) for p in paths]
+    out = {}
+    for bs in PREDICT_BATCHES:
+        predict = lambda chunk: model.predict(source=chunk, imgsz=yolo_predict.IMGSZ, batch=len(chunk),
+                                              device="cpu", save=False, verbose=False)
+        predict(images[:bs])  # warm-up
+        t = time.perf_counter()
+        for i in range(0, len(images), bs):
+            predict(images[i:i + bs])
+        out[f"batch{bs}.ms_per_image"] = round((time.perf_counter() - t) / len(images) * 1000, 2)
+    return out
+
+CASES = {
+    "place_alpha": bench_place_alpha,
+    "generate_image": bench_generate_image,
+    "lableing_main": bench_lableing_main,
+    "yolo_predict": bench_yolo_predict,
+}
+
+# ---------------------------------------------------------------------------
+# 4. Runner, baseline comparison
+# ---------------------------------------------------------------------------
+
+def _peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10  # bytes vs KiB
+
+def _run_case(name):
+    # threads are pinned so results do not depend on how busy the box is
+    cv2.setNumThreads(1)
+    with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+        metrics = CASES[name](Path(tmp))
+    metrics["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+    return metrics
+
+def run_cases(names):
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for name in names:
+        print(f"▶ {name}")
+        with ctx.Pool(1) as pool:
+            results[name] = pool.apply(_run_case, (name,))
+        for k, v in results[name].items():
+            print(f"    {k:<28} {v}")
+    return results
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Return ``[(case, metric, base, now, change)]`` for metrics worse than *tolerance*."""
+    regressions = []
+    for case, metrics in results.items():
+        for metric, now in metrics.items():
+            sign = DIRECTION.get(metric.rsplit(".", 1)[-1])
+            base = baseline.get(case, {}).get(metric)
+            if sign is None or not isinstance(base, (int, float)) or not base:
+                continue
+            change = (now - base) / base
+            if sign * change < -tolerance:
+                regressions.append((case, metric, base, now, change))
+    return regressions
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the generator and inference hot paths.")
+    ap.add_argument("cases", nargs="*", metavar="case",
+                    help=f"cases to run (default: all of {', '.join(CASES)})")
+    ap.add_argument("--out", type=Path, default=RESULTS)
+    ap.add_argument("--baseline", type=Path, default=BASELINE)
+    ap.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    ap.add_argument("--tolerance", type=float, default=TOLERANCE)
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    unknown = set(args.cases) - set(CASES)
+    if unknown:
+        raise SystemExit(f"Unknown case(s): {', '.join(sorted(unknown))}")
+    results = run_cases(args.cases or list(CASES))
+    report = {"environment": environment(), "results": results}
+    args.out.write_text(json.dumps(report, indent=2))
+    print(f"✅ Results saved to {args.out}")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"✅ Baseline saved to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"⚠️ No baseline at {args.baseline} – run with --save-baseline first")
+        return 0
+    regressions = compare(results, json.loads(args.baseline.read_text())["results"], args.tolerance)
+    for case, metric, base, now, change in regressions:
+        print(f"⚠️ REGRESSION {case}.{metric}: {base} → {now} ({change:+.0%})")
+    if not regressions:
+        print(f"✅ No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""
+Compare many trained checkpoints on the validation split in one pass.
+
+``model.val()`` per run decodes and letterboxes ``dataset/images/val``
+again for every checkpoint.  Here the split is decoded once into the
+letterboxed memmap of ``train_cache.py`` (under ``.train_cache/val``,
+reused while the files are unchanged), and every checkpoint predicts on
+views of that same array.  Evaluating *N* runs therefore costs one decode
+plus *N* forward passes.
+
+Predictions are matched to the ground truth per image with a vectorised
+IoU matrix at IoU 0.50:0.95, and precision/recall (at the confidence of
+best mean F1), mAP50 and mAP50-95 are computed per class as ultralytics
+does (101-point interpolated AP).  One table compares all runs::
+
+    python evaluate_runs.py                                  # every runs/detect/train*/weights/best.pt
+    python evaluate_runs.py runs/detect/train7 runs/detect/train14 --per-class --csv eval.csv
+
+Letterboxing is square (``rect=False``), so the numbers can differ
+slightly from ``results.csv``, which validates on rectangular batches.
+"""
+
+import csv
+import glob
+import time
+import argparse
+from pathlib import Path
+
+from ultralytics import YOLO
+import numpy as np
+
+import train_cache
+import validate_labels
+import yolo_predict
+
+DATA = Path('dataset.yaml')
+VAL_SOURCE = (Path('dataset/images/val'), Path('dataset/labels/val'))
+RUNS = 'runs/detect/train*/weights/best.pt'
+CACHE_ROOT = train_cache.CACHE_ROOT / 'val'
+CONF = 0.001  #ultralytics val defaults
+IOU = 0.7
+MAX_DET = 300
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+# ---------------------------------------------------------------------------
+# Matching and AP
+# ---------------------------------------------------------------------------
+
+def match_predictions(pred_xyxy, pred_cls, gt_xyxy, gt_cls, thresholds=IOU_THRESHOLDS):
+    """``(n_pred, n_thresholds)`` bool: is each prediction a true positive at each IoU threshold.
+
+    Every ground-truth box takes at most one prediction of its class,
+    greedily by descending IoU.
+    """
+    correct = np.zeros((len(pred_xyxy), len(thresholds)), bool)
+    if len(pred_xyxy) == 0 or len(gt_xyxy) == 0:
+        return correct
+    iou = yolo_predict.pairwise_overlap(gt_xyxy, pred_xyxy) * (gt_cls[:, None] == pred_cls[None, :])
+    for k, t in enumerate(thresholds):
+        gt, pred = np.nonzero(iou >= t)
+        if not len(gt):
+            continue
+        order = np.argsort(-iou[gt, pred], kind='stable')
+        gt, pred = gt[order], pred[order]
+        first = np.sort(np.unique(pred, return_index=True)[1])  #best match per prediction
+        gt, pred = gt[first], pred[first]
+        first = np.unique(gt, return_index=True)[1]  #then best prediction per ground truth
+        correct[pred[first], k] = True
+    return correct
+
+
+def average_precision(recall, precision):
+    """COCO 101-point interpolated AP of one precision/recall curve."""
+    mrec = np.concatenate([[0.0], recall, [1.0]])
+    mpre = np.flip(np.maximum.accumulate(np.flip(np.concatenate([[1.0], precision, [0.0]]))))
+    x = np.linspace(0, 1, 101)
+    y = np.interp(x, mrec, mpre)
+    return float(((y[1:] + y[:-1]) / 2 * np.diff(x)).sum())
+
+
+def ap_per_class(tp, conf, pred_cls, gt_cls, nc, eps=1e-16):
+    """Per-class ``(precision, recall, ap (nc, n_thresholds), instances)``.
+
+    Precision and recall are read at the confidence that maximises the
+    (smoothed) F1 averaged over the classes present in the ground truth.
+    """
+    order = np.argsort(-conf, kind='stable')
+    tp, conf, pred_cls = tp[order], conf[order], pred_cls[order]
+    n_gt = np.bincount(gt_cls, minlength=nc)
+    grid = np.linspace(0, 1, 1000)
+    ap = np.zeros((nc, tp.shape[1]))
+    p_curve, r_curve = np.zeros((nc, len(grid))), np.zeros((nc, len(grid)))
+    for c in np.flatnonzero(n_gt):
+        i = pred_cls == c
+        if not i.any():
+            continue
+        tpc = tp[i].cumsum(0)
+        fpc = (~tp[i]).cumsum(0)
+        recall = tpc / (n_gt[c] + eps)
+        precision = tpc / (tpc + fpc)
+        r_curve[c] = np.interp(-grid, -conf[i], recall[:, 0], left=0)
+        p_curve[c] = np.interp(-grid, -conf[i], precision[:, 0], left=1)
+        ap[c] = [average_precision(recall[:, k], precision[:, k]) for k in range(tp.shape[1])]
+    present = n_gt > 0
+    f1 = (2 * p_curve * r_curve / (p_curve + r_curve + eps))[present].mean(0) if present.any() \
+        else np.zeros(len(grid))
+    best = np.convolve(np.pad(f1, 50, mode='edge'), np.ones(101) / 101, mode='valid').argmax()
+    return p_curve[:, best], r_curve[:, best], ap, n_gt
+
+
+# ---------------------------------------------------------------------------
+# Evaluation
+# ---------------------------------------------------------------------------
+
+def load_val(source=VAL_SOURCE, imgsz=yolo_predict.IMGSZ, root=CACHE_ROOT):
+    """Decode (or reuse) the letterboxed split; return ``(cache, [(gt_xyxy, gt_cls)])``."""
+    cache = train_cache.TrainCache(train_cache.build_cache([source], imgsz, root))
+    targets = []
+    for i in range(len(cache)):
+        lbl = cache.labels(i)
+        cx, cy, w, h = (lbl[:, 1:] * imgsz).T
+        targets.append((np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], 1),
+                        lbl[:, 0].astype(int)))
+    return cache, targets
+
+
+def predict_all(model, cache, batch_size=yolo_predict.BATCH_SIZE, conf=CONF, iou=IOU):
+    """``[(xyxy, conf, cls)]`` per image of *cache* (already at the model's input size)."""
+    out = []
+    for i in range(0, len(cache), batch_size):
+        images = [cache.image(j) for j in range(i, min(i + batch_size, len(cache)))]
+        results = model.predict(source=images, imgsz=cache.imgsz, conf=conf, iou=iou,
+                                max_det=MAX_DET, batch=len(images), save=False, verbose=False)
+        out += [yolo_predict.result_arrays(r) for r in results]
+    return out
+
+
+def evaluate(predictions, targets, nc):
+    """Per-class metrics of one run: ``{precision, recall, map50, map50_95, instances}`` arrays."""
+    tp = [match_predictions(p[0], p[2], g[0], g[1]) for p, g in zip(predictions, targets)]
+    p, r, ap, n_gt = ap_per_class(np.concatenate(tp), np.concatenate([p[1] for p in predictions]),
+                                  np.concatenate([p[2] for p in predictions]),
+                                  np.concatenate([g[1] for g in targets]), nc)
+    return {'precision': p, 'recall': r, 'map50': ap[:, 0], 'map50_95': ap.mean(1), 'instances': n_gt}
+
+
+def summary(metrics):
+    """Mean of every metric over the classes with ground truth."""
+    present = metrics['instances'] > 0
+    return {k: float(v[present].mean()) if present.any() else 0.0
+            for k, v in metrics.items() if k != 'instances'}
+
+
+def checkpoints(specs):
+    """``{run name: best.pt}`` for run folders, weight files and glob patterns."""
+    found = {}
+    for spec in specs:
+        for s in sorted(glob.glob(spec)) or [spec]:
+            p = Path(s)
+            if p.is_dir():
+                p = p / 'weights' / 'best.pt'
+            if not p.exists():
+                print(f"⚠️ {p} not found – skipped")
+                continue
+            name = p.parent.parent.name if p.parent.name == 'weights' else p.stem
+            found[name if name not in found else str(p)] = p
+    return found
+
+
+def _table(header, rows):
+    rows = [[f'{v:.4f}' if isinstance(v, float) else str(v) for v in r] for r in rows]
+    widths = [max(len(h), *(len(r[i]) for r in rows)) for i, h in enumerate(header)]
+    print('  '.join(h.ljust(w) for h, w in zip(header, widths)))
+    for r in rows:
+        print('  '.join(v.ljust(w) for v, w in zip(r, widths)))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Evaluate many checkpoints on one decoded validation split.")
+    ap.add_argument('runs', nargs='*', default=[RUNS],
+                    help="run folders, best.pt files or glob patterns (default: %(default)s)")
+    ap.add_argument('--data', type=Path, default=DATA, help="dataset yaml with nc and names")
+    ap.add_argument('--images', type=Path, default=VAL_SOURCE[0])
+    ap.add_argument('--labels', type=Path, default=VAL_SOURCE[1])
+    ap.add_argument('--imgsz', type=int, default=yolo_predict.IMGSZ)
+    ap.add_argument('--batch', type=int, default=16)
+    ap.add_argument('--conf', type=float, default=CONF)
+    ap.add_argument('--iou', type=float, default=IOU)
+    ap.add_argument('--cache-root', type=Path, default=CACHE_ROOT)
+    ap.add_argument('--per-class', action='store_true', help="also print mAP50-95 per class and run")
+    ap.add_argument('--csv', default=None, help="write per-class P/R/mAP50/mAP50-95 of every run")
+    args = ap.parse_args(argv)
+
+    runs = checkpoints(args.runs)
+    if not runs:
+        raise SystemExit("No checkpoints found")
+    nc, names = validate_labels.read_classes(args.data)
+    t = time.perf_counter()
+    cache, targets = load_val((args.images, args.labels), args.imgsz, args.cache_root)
+    print(f"Validation split: {len(cache)} images, {sum(len(g[1]) for g in targets)} boxes "
+          f"({time.perf_counter() - t:.1f} s)")
+
+    results, rows = {}, []
+    for name, weights in runs.items():
+        t = time.perf_counter()
+        predictions = predict_all(YOLO(str(weights)), cache, args.batch, args.conf, args.iou)
+        forward = time.perf_counter() - t
+        results[name] = evaluate(predictions, targets, nc)
+        s = summary(results[name])
+        rows.append([name, s['precision'], s['recall'], s['map50'], s['map50_95'],
+                     f'{forward / len(cache) * 1000:.1f}'])
+        print(f"  {name}: mAP50-95 {s['map50_95']:.4f} ({forward:.1f} s)")
+
+    print()
+    _table(['run', 'P', 'R', 'mAP50', 'mAP50-95', 'ms/img'], sorted(rows, key=lambda r: -r[4]))
+    if args.per_class:
+        print()
+        instances = next(iter(results.values()))['instances']
+        _table(['class', 'instances', *results],
+               [[names[c] if c < len(names) else str(c), int(instances[c]),
+                 *(float(m['map50_95'][c]) for m in results.values())] for c in np.flatnonzero(instances)])
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            w = csv.writer(f)
+            w.writerow(['run', 'class', 'instances', 'precision', 'recall', 'map50', 'map50_95'])
+            for name, m in results.items():
+                for c in np.flatnonzero(m['instances']):
+                    w.writerow([name, names[c] if c < len(names) else c, int(m['instances'][c]),
+                                *(round(float(m[k][c]), 5) for k in ('precision', 'recall', 'map50', 'map50_95'))])
+        print(f"✅ Per-class metrics written to {args.csv}")
+
+
+if __name__ == '__main__':
+    main()
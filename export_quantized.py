@@ -0,0 +1,158 @@
+"""
+CPU export and INT8 quantization for a trained run.
+
+Exports ``<run>/weights/best.pt`` for CPU inference and compares every
+variant against the PyTorch checkpoint::
+
+    best.onnx                    ONNX Runtime, FP32
+    best_int8.onnx               ONNX Runtime, static INT8 (QDQ)
+    best_int8_openvino_model/    OpenVINO, INT8 (NNCF, via ultralytics)
+
+Both INT8 paths are calibrated on images from ``dataset/images/val``.
+The report (latency per image on CPU, mAP50 and mAP50-95 on the
+validation split) is printed and saved as ``<run>/weights/quant_report.json``.
+Pick a variant in ``yolo_predict.py`` with ``--backend``::
+
+    python export_quantized.py runs/detect/train14
+    python yolo_predict.py cropped_enhanced/ --weights runs/detect/train14/weights/best.pt --backend onnx-int8
+"""
+
+import json
+import time
+import argparse
+from pathlib import Path
+
+from ultralytics import YOLO
+import cv2
+import numpy as np
+
+import train_cache
+import yolo_predict
+
+DATA = 'dataset.yaml'
+VAL_IMAGES = Path('dataset/images/val')
+CALIBRATION_IMAGES = 100  #max images fed to the ORT calibrator
+LATENCY_IMAGES = 30
+
+
+# ---------------------------------------------------------------------------
+# ONNX Runtime static INT8
+# ---------------------------------------------------------------------------
+
+def calibration_batches(folder=VAL_IMAGES, imgsz=yolo_predict.IMGSZ, limit=CALIBRATION_IMAGES):
+    """Yield NCHW float32 RGB tensors (batch 1) from *folder*."""
+    for p in yolo_predict.iter_image_paths([str(folder)])[:limit]:
+        img = cv2.imread(str(p), cv2.IMREAD_COLOR)
+        if img is None:
+            continue
+        x = np.empty((imgsz, imgsz, 3), np.uint8)
+        train_cache.letterbox_into(x, img)  #grey 114 padding, as ultralytics
+        x = x[:, :, ::-1].transpose(2, 0, 1)
+        yield np.ascontiguousarray(x, np.float32)[None] / 255.0
+
+
+def quantize_onnx(fp32_path, int8_path, imgsz=yolo_predict.IMGSZ, folder=VAL_IMAGES):
+    """Statically quantize *fp32_path* to INT8 with ONNX Runtime."""
+    import onnx
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_static)
+
+    input_name = onnx.load(str(fp32_path), load_external_data=False).graph.input[0].name
+
+    class ValReader(CalibrationDataReader):
+        def __init__(self):
+            self._it = iter(calibration_batches(folder, imgsz))
+
+        def get_next(self):
+            x = next(self._it, None)
+            return None if x is None else {input_name: x}
+
+    quantize_static(str(fp32_path), str(int8_path), ValReader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                    per_channel=True)
+    # ultralytics reads stride/names/imgsz from the ONNX metadata – carry it over
+    src, dst = onnx.load(str(fp32_path)), onnx.load(str(int8_path))
+    del dst.metadata_props[:]
+    dst.metadata_props.extend(src.metadata_props)
+    onnx.save(dst, str(int8_path))
+    return Path(int8_path)
+
+
+# ---------------------------------------------------------------------------
+# Export, evaluation and report
+# ---------------------------------------------------------------------------
+
+def export_all(weights, imgsz=yolo_predict.IMGSZ, data=DATA, folder=VAL_IMAGES, openvino=True):
+    """Export *weights*; return ``{backend: path}`` for every variant produced."""
+    weights = Path(weights)
+    variants = {'pt': weights}
+    model = YOLO(str(weights))
+    onnx_path = Path(model.export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True))
+    variants['onnx'] = onnx_path
+    variants['onnx-int8'] = quantize_onnx(onnx_path, yolo_predict.backend_weights(weights, 'onnx-int8'),
+                                          imgsz, folder)
+    if openvino:
+        try:
+            variants['openvino-int8'] = Path(YOLO(str(weights)).export(
+                format='openvino', int8=True, data=data, imgsz=imgsz))
+        except Exception as exc:  #openvino/nncf are optional
+            print(f"⚠️ OpenVINO INT8 export skipped: {exc}")
+    return variants
+
+
+def cpu_latency_ms(model, images, imgsz):
+    model.predict(source=images[0], imgsz=imgsz, device='cpu', verbose=False)  #warm-up
+    t = time.perf_counter()
+    for img in images:
+        model.predict(source=img, imgsz=imgsz, device='cpu', verbose=False)
+    return (time.perf_counter() - t) / len(images) * 1000
+
+
+def evaluate(variants, data=DATA, imgsz=yolo_predict.IMGSZ, folder=VAL_IMAGES):
+    """Latency and mAP of every variant; returns a list of report rows."""
+    paths = yolo_predict.iter_image_paths([str(folder)])[:LATENCY_IMAGES]
+    images = [im for im in (cv2.imread(str(p), cv2.IMREAD_COLOR) for p in paths) if im is not None]
+    if not images:
+        raise SystemExit(f"No readable images in {folder}")
+    rows = []
+    for backend, path in variants.items():
+        model = YOLO(str(path), task='detect')
+        metrics = model.val(data=data, imgsz=imgsz, batch=1, device='cpu', plots=False, verbose=False)
+        rows.append({'backend': backend, 'path': str(path),
+                     'latency_ms': round(cpu_latency_ms(model, images, imgsz), 2),
+                     'map50': round(float(metrics.box.map50), 4),
+                     'map50_95': round(float(metrics.box.map), 4)})
+    return rows
+
+
+def print_report(rows):
+    base = rows[0]
+    print(f"{'backend':<15}{'latency ms':>12}{'speed-up':>10}{'mAP50':>9}{'mAP50-95':>10}{'Δ mAP50-95':>12}")
+    for r in rows:
+        print(f"{r['backend']:<15}{r['latency_ms']:>12.1f}{base['latency_ms'] / r['latency_ms']:>9.2f}x"
+              f"{r['map50']:>9.3f}{r['map50_95']:>10.3f}{r['map50_95'] - base['map50_95']:>+12.3f}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export a trained run for CPU and quantize it to INT8.")
+    ap.add_argument('run', type=Path, help="run directory, e.g. runs/detect/train14")
+    ap.add_argument('--weights', default='best.pt', help="checkpoint inside <run>/weights")
+    ap.add_argument('--data', default=DATA)
+    ap.add_argument('--imgsz', type=int, default=yolo_predict.IMGSZ)
+    ap.add_argument('--calib', type=Path, default=VAL_IMAGES, help="ORT calibration and latency image folder")
+    ap.add_argument('--no-openvino', action='store_true')
+    args = ap.parse_args(argv)
+
+    weights = args.run / 'weights' / args.weights
+    if not weights.exists():
+        raise SystemExit(f"{weights} not found")
+    variants = export_all(weights, args.imgsz, args.data, args.calib, not args.no_openvino)
+    rows = evaluate(variants, args.data, args.imgsz, args.calib)
+    print_report(rows)
+    out = weights.parent / 'quant_report.json'
+    out.write_text(json.dumps(rows, indent=2))
+    print(f"✅ Report saved to {out}")
+
+
+if __name__ == '__main__':
+    main()
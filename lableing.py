@@ -2,20 +2,68 @@
 """
 Synthetic dataset generator for HVAC/BMS symbol detection (YOLO‑format).
 
+Revision C
+----------
+* **Importable library** – importing this module no longer touches the
+  disk.  :class:`SyntheticGenerator` loads its assets lazily on first use
+  and ``main()`` is a command‑line entry point (``--help``) for every
+  setting that used to be a hard‑coded constant.
+* **Faster generation** – occupancy‑grid placement (:class:`OccupancyGrid`),
+  precomputed integer alpha blending (:class:`Sprite`), a memory‑mapped asset
+  atlas (``load_assets``) and deterministic process‑pool generation where
+  each image is seeded from ``--seed`` and its index.
+* **Pipelined output** – encoding and file I/O run on writer threads behind
+  a bounded queue (:class:`SampleWriter`); the codec is selectable
+  (``--codec jpg|png|webp|raw``) and per‑stage throughput is reported.
+  With ``--shard-size N`` samples go into ``shards.py`` containers of *N*
+  samples each instead of one image + one label file per sample.
+* **Profiling** – ``--profile`` prints stage timings (asset loading, layout,
+  rendering, encoding, image and label writes), per‑class placement
+  attempts/rejections/failures and the canvas fill ratio; ``--profile-json``
+  also saves them.  Disabled, it costs nothing measurable.
+* **Incremental regeneration** – ``synthetic_manifest.json`` records the
+  seed, input hashes and placed assets of every sample; ``--incremental``
+  rewrites only samples whose inputs changed (only the label files if just the class
+  mapping changed) and deletes stale outputs (``--prune`` alone does only
+  that); ``dataset.yaml`` keeps ``nc``/``names`` in step with the class list.
+* **Symbol variants** – ``--scales``, ``--rotations`` and ``--flip`` build a
+  pyramid of resized, rotated and mirrored copies of every symbol once per
+  asset set (cropped to their alpha, cached next to the asset atlas); each
+  placement picks one at random, so nothing is resampled per image.  The
+  defaults keep the single original size and orientation.
+* **Tiled output** – ``--tile 640`` lays out the full canvas as before but
+  writes overlapping 640×640 crops of it, with boxes clipped to each tile
+  (dropped below ``--min-visibility``) and re‑normalised; ``--val-every N``
+  keeps every *N*‑th canvas whole for validating tiled inference.
+
 Revision B (2025‑06‑23)
 -----------------------
 * **Removed automatic symbol scaling** – components now retain their
   original pixel dimensions.
 * Minor cleanup of now‑unused constants.
 
-Edit constants in *section 5* as needed.
+The constants in *section 4* are the defaults for the command‑line options::
+
+    python lableing.py --num-images 20000 --workers 16 --seed 7
 """
 
+import os
+import re
+import json
+import hashlib
+import time
 import cv2
 import random
+import io
+import queue
+import argparse
+import threading
+import multiprocessing
 import numpy as np
 from pathlib import Path
 
+import shards
+
 # ---------------------------------------------------------------------------
 # 1. Raw class dictionary (unchanged) – used only for name matching.
 # ---------------------------------------------------------------------------
@@ -136,6 +184,7 @@ class_group_mapping = {
 general_names = {class_group_mapping.get(n, n) for n in dict_original_class_id}
 final_class_names = sorted(general_names)
 final_class_ids = {name: idx for idx, name in enumerate(final_class_names)}
+CLASS_NAMES = dict(enumerate(final_class_names))
 
 # ---------------------------------------------------------------------------
 # 4. Paths & global constants
@@ -143,26 +192,51 @@ final_class_ids = {name: idx for idx, name in enumerate(final_class_names)}
 
 GROUND_TRUTH_DIR = Path("ground_truth_dilt_labelled")
 CONTEXT_DIR = Path("context_images")
+ASSET_CACHE = Path(".asset_cache/atlas")    # → atlas.npy + atlas.json
 OUT_IMG_DIR = Path("synthetic_dataset")
 OUT_LABEL_DIR = Path("synthetic_labels")
-OUT_IMG_DIR.mkdir(parents=True, exist_ok=True)
-OUT_LABEL_DIR.mkdir(parents=True, exist_ok=True)
+OUT_SHARD_DIR = Path("synthetic_shards")
+MANIFEST = Path("synthetic_manifest.json")  # per-sample inputs (see plan_regeneration)
+DATASET_YAML = Path("dataset.yaml")         # nc/names kept in sync with final_class_names
 
 NUM_IMAGES = 100
 IMG_W, IMG_H = 1700, 800
 BACKGROUND_RGB = (230, 178, 172)
-MAX_PLACEMENT_TRIES = 300
+MAX_PLACEMENT_TRIES = 8         # random probes before an exhaustive free-space scan
+GRID_CELL = 4                   # occupancy-grid resolution in pixels
+VARIANT_SCALES = (1.0,)         # symbol variants (see load_variants); the defaults
+VARIANT_ROTATIONS = (0,)        # keep every symbol at its original size and
+VARIANT_FLIP = False            # orientation
+
+BASE_SEED = 0                   # per-image seeds are derived from this
+NUM_WORKERS = os.cpu_count() or 1
+CHUNK_SIZE = 8                  # indices handed to a worker at a time
+
+CODEC = "jpg"                   # jpg | png | webp | raw (see encode_image)
+QUALITY = None                  # codec default: JPEG/WebP 95, PNG level 3
+WRITER_THREADS = 2              # encode/write threads per generating process
+WRITE_QUEUE = 4                 # composed images waiting for a writer
+SHARD_SIZE = 0                  # >0: write shards of this many samples (see shards.py)
+TILE = 0                        # >0: write TILE×TILE crops of each canvas (see tile_grid)
+TILE_OVERLAP = 0.2              # fraction of a tile shared with its neighbour
+MIN_VISIBILITY = 0.5            # keep a clipped box if this much of its area is in the tile
+VAL_EVERY = 0                   # tiled runs: >0 keeps every VAL_EVERY-th canvas whole instead
+OUT_VAL_IMG_DIR = Path("synthetic_dataset_val")
+OUT_VAL_LABEL_DIR = Path("synthetic_labels_val")
 
 # ---------------------------------------------------------------------------
 # 5. Helper functions
 # ---------------------------------------------------------------------------
 
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg"}
+
+def image_files(folder: Path):
+    return [p for p in folder.glob("*.*") if p.suffix.lower() in IMAGE_SUFFIXES]
+
 def load_images(folder: Path):
     """Return list[(file_name, img_BGRorBGRA)]."""
     images = []
-    for p in folder.glob("*.*"):
-        if p.suffix.lower() not in {".png", ".jpg", ".jpeg"}:
-            continue
+    for p in image_files(folder):
         img = cv2.imread(str(p), cv2.IMREAD_UNCHANGED)
         if img is not None:
             images.append((p.name, img))
@@ -181,90 +255,1184 @@ def class_id_from_file(fname: str) -> int:
             return final_class_ids[generalise(k)]
     raise KeyError(fname)
 
+class Sprite:
+    """An image prepared once for repeated alpha compositing.
+
+    ``premul`` holds ``colour·alpha + 128`` and ``inv_alpha`` ``255 − alpha``
+    (both ``uint16``), so a blend is ``(dst·inv_alpha + premul) / 255`` in
+    integer arithmetic.  Fully opaque images are copied and fully transparent
+    ones skipped.
+    """
+
+    __slots__ = ("img", "class_id", "h", "w", "mode", "bgr", "premul", "inv_alpha")
+    OPAQUE, BLEND, EMPTY = "opaque", "blend", "empty"
+
+    def __init__(self, img, class_id=None):
+        self.img, self.class_id = img, class_id
+        self.h, self.w = img.shape[:2]
+        self.bgr = np.ascontiguousarray(img[:, :, :3])
+        self.premul = self.inv_alpha = None
+        alpha = img[:, :, 3] if img.shape[2] == 4 else None
+        if alpha is None or alpha.min() == 255:
+            self.mode = Sprite.OPAQUE
+        elif alpha.max() == 0:
+            self.mode = Sprite.EMPTY
+        else:
+            self.mode = Sprite.BLEND
+            a = alpha[:, :, None].astype(np.uint16)
+            self.premul = self.bgr * a + 128
+            self.inv_alpha = np.broadcast_to(255 - a, self.bgr.shape).copy()
+
+    @property
+    def shape(self):
+        return self.img.shape
+
 def place_alpha(dst, src, tl):
+    """Composite *src* (a :class:`Sprite` or BGR/BGRA array) onto *dst* at *tl*."""
+    if not isinstance(src, Sprite):
+        src = Sprite(src)
     x, y = tl
-    h, w = src.shape[:2]
-    if src.shape[2] == 4:
-        alpha = src[:, :, 3] / 255.0
-        for c in range(3):
-            dst[y:y+h, x:x+w, c] = (1-alpha) * dst[y:y+h, x:x+w, c] + alpha * src[:, :, c]
-    else:
-        dst[y:y+h, x:x+w] = src[:, :, :3]
+    roi = dst[y:y + src.h, x:x + src.w]
+    if src.mode is Sprite.BLEND:
+        t = roi * src.inv_alpha          # uint8 · uint16 → uint16, ≤ 65025
+        t += src.premul
+        t += t >> 8                      # exact ⌊t / 255⌋ for t ≤ 65153
+        t >>= 8
+        roi[...] = t
+    elif src.mode is Sprite.OPAQUE:
+        roi[...] = src.bgr
+
+class OccupancyGrid:
+    """Coarse occupancy map of the canvas used to place non-overlapping boxes.
+
+    The canvas is divided into ``cell``×``cell`` pixel cells; a box occupies
+    every cell it touches, so placements are conservative by at most one cell.
+    ``place`` first probes ``probes`` random cell-aligned positions and, if all
+    are taken, scans every free position at once through an integral image
+    of the grid.  Counters are kept for per-image placement statistics.
+    """
+
+    def __init__(self, width, height, cell=GRID_CELL, probes=MAX_PLACEMENT_TRIES):
+        self.cell, self.probes = cell, probes
+        self.width, self.height = width, height
+        # a partial last row/column of cells is never used
+        self.occ = np.zeros((height // cell, width // cell), np.uint8)
+        self.n_probes = self.n_scans = self.n_failed = 0
+
+    def place(self, rng: random.Random, w: int, h: int):
+        """Reserve a free ``w``×``h`` box; return its top-left ``(x, y)`` or None."""
+        c, occ = self.cell, self.occ
+        cw, ch = -(-w // c), -(-h // c)
+        gh, gw = occ.shape
+        if cw > gw or ch > gh:
+            self.n_failed += 1
+            return None
+
+        pos = None
+        for _ in range(self.probes):
+            self.n_probes += 1
+            gx, gy = rng.randint(0, gw - cw), rng.randint(0, gh - ch)
+            if not occ[gy:gy + ch, gx:gx + cw].any():
+                pos = gx, gy
+                break
+        if pos is None:
+            self.n_scans += 1
+            ii = cv2.integral(occ)
+            win = ii[ch:, cw:] - ii[:-ch, cw:] - ii[ch:, :-cw] + ii[:-ch, :-cw]
+            free = np.flatnonzero(win == 0)
+            if free.size == 0:
+                self.n_failed += 1
+                return None
+            gy, gx = divmod(int(free[rng.randrange(free.size)]), win.shape[1])
+            pos = gx, gy
+
+        gx, gy = pos
+        occ[gy:gy + ch, gx:gx + cw] = 1
+        # jitter inside the reserved cells so positions stay pixel-uniform
+        return (gx * c + rng.randint(0, cw * c - w),
+                gy * c + rng.randint(0, ch * c - h))
+
+class Profile:
+    """Optional stage timers and placement counters for a run (``--profile``).
+
+    Everything that records into a profile is guarded by ``profile is not
+    None``, so a disabled profile costs one comparison per call site.
+    ``classes`` maps a class name to ``[symbols, attempts, rejections,
+    scans, failures]``: *attempts* are random probes plus full scans,
+    *rejections* probes that hit an occupied cell.  Profiles from several
+    workers are combined with :meth:`merge` on their :meth:`to_dict`.
+    """
+
+    STAGES = ("load", "layout", "render", "encode", "write_image", "write_labels", "stall")
+    CLASS_COLUMNS = ("symbols", "attempts", "rejections", "scans", "failures")
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(Profile.STAGES, 0.0)
+        self.classes = {}
+        self.images = 0
+        self.fill = [0.0, 1.0, 0.0]      # sum, min, max of the covered canvas fraction
+        self._lock = threading.Lock()
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def count_symbol(self, class_name, probes, scans, placed):
+        row = self.classes.setdefault(class_name, [0] * len(Profile.CLASS_COLUMNS))
+        row[0] += 1
+        row[1] += probes + scans
+        row[2] += probes - (1 if placed and not scans else 0)
+        row[3] += scans
+        row[4] += not placed
+
+    def add_image(self, fill):
+        self.images += 1
+        self.fill[0] += fill
+        self.fill[1] = min(self.fill[1], fill)
+        self.fill[2] = max(self.fill[2], fill)
+
+    def to_dict(self):
+        return {
+            "images": self.images,
+            "seconds": dict(self.seconds),
+            "fill": {"mean": self.fill[0] / self.images if self.images else 0.0,
+                     "min": self.fill[1] if self.images else 0.0, "max": self.fill[2],
+                     "sum": self.fill[0]},
+            "classes": {name: dict(zip(Profile.CLASS_COLUMNS, row))
+                        for name, row in sorted(self.classes.items())},
+        }
+
+    def merge(self, d):
+        """Add a :meth:`to_dict` result (e.g. from a worker process)."""
+        with self._lock:
+            for stage, sec in d["seconds"].items():
+                self.seconds[stage] = self.seconds.get(stage, 0.0) + sec
+            for name, row in d["classes"].items():
+                mine = self.classes.setdefault(name, [0] * len(Profile.CLASS_COLUMNS))
+                for i, col in enumerate(Profile.CLASS_COLUMNS):
+                    mine[i] += row[col]
+            if d["images"]:
+                self.images += d["images"]
+                self.fill[0] += d["fill"]["sum"]
+                self.fill[1] = min(self.fill[1], d["fill"]["min"])
+                self.fill[2] = max(self.fill[2], d["fill"]["max"])
+
+    def summary(self):
+        """The profile as a printable table."""
+        d = self.to_dict()
+        total = sum(d["seconds"].values()) or 1.0
+        lines = [f"{'stage':<14}{'seconds':>10}{'share':>8}{'ms/image':>10}"]
+        for stage, sec in d["seconds"].items():
+            per = sec / self.images * 1000 if self.images else 0.0
+            lines.append(f"{stage:<14}{sec:>10.3f}{sec / total:>8.1%}{per:>10.2f}")
+        f = d["fill"]
+        lines.append(f"canvas fill: mean {f['mean']:.1%}, min {f['min']:.1%}, max {f['max']:.1%}"
+                     f" over {self.images} images")
+        lines.append(f"{'class':<40}" + "".join(f"{c:>11}" for c in Profile.CLASS_COLUMNS))
+        for name, row in d["classes"].items():
+            lines.append(f"{name:<40}" + "".join(f"{row[c]:>11}" for c in Profile.CLASS_COLUMNS))
+        return "\n".join(lines)
 
 # ---------------------------------------------------------------------------
 # 6. Load resources (no scaling – symbols keep original size)
 # ---------------------------------------------------------------------------
 
-print("Loading symbols …")
-SYMBOLS = load_images(GROUND_TRUTH_DIR)
-if not SYMBOLS:
-    raise SystemExit("No symbols found – check GROUND_TRUTH_DIR path")
+def _asset_fingerprint(*folders):
+    return sorted([str(p), st.st_size, st.st_mtime_ns]
+                  for folder in folders for p in image_files(folder)
+                  for st in [p.stat()])
+
+def _write_atlas(cache: Path, fingerprint, symbols, contexts):
+    """Pack decoded images into ``cache.npy`` and describe them in ``cache.json``."""
+    entries, chunks, offset = [], [], 0
+    for kind, items in (("symbol", symbols), ("context", contexts)):
+        for name, img in items:
+            img = np.ascontiguousarray(img)
+            entries.append({"kind": kind, "name": name, "offset": offset,
+                            "shape": list(img.shape),
+                            "class_id": class_id_from_file(name) if kind == "symbol" else None})
+            chunks.append(img.reshape(-1))
+            offset += img.size
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    # write-then-rename so concurrent readers never see a half-written atlas
+    tmp_npy, tmp_json = cache.with_suffix(".npy.tmp"), cache.with_suffix(".json.tmp")
+    with open(tmp_npy, "wb") as f:
+        np.save(f, np.concatenate(chunks) if chunks else np.empty(0, np.uint8))
+    tmp_json.write_text(json.dumps({"fingerprint": fingerprint, "entries": entries}))
+    os.replace(tmp_npy, cache.with_suffix(".npy"))
+    os.replace(tmp_json, cache.with_suffix(".json"))
 
-# sort by area descending so big ones placed first
-SYMBOLS.sort(key=lambda it: it[1].shape[0] * it[1].shape[1], reverse=True)
+def _read_atlas(cache: Path, fingerprint):
+    """Return memory-mapped ``(symbols, contexts)`` or None if stale/missing."""
+    try:
+        index = json.loads(cache.with_suffix(".json").read_text())
+        if index["fingerprint"] != fingerprint:
+            return None
+        blob = np.load(cache.with_suffix(".npy"), mmap_mode="r")
+    except (OSError, ValueError, KeyError):
+        return None
+    symbols, contexts = [], []
+    for e in index["entries"]:
+        shape = tuple(e["shape"])
+        img = blob[e["offset"]:e["offset"] + int(np.prod(shape))].reshape(shape)
+        if e["kind"] == "symbol":
+            # ids come from the current class mapping, not the one at atlas time
+            symbols.append((e["name"], Sprite(img, class_id_from_file(e["name"]))))
+        else:
+            contexts.append(Sprite(img))
+    return symbols, contexts
 
-print(f"  {len(SYMBOLS)} symbols loaded")
+def load_assets(symbol_dir=GROUND_TRUTH_DIR, context_dir=CONTEXT_DIR, cache=ASSET_CACHE):
+    """Return ``(symbols, contexts)`` as ``[(file_name, Sprite)]`` and ``[Sprite]``.
 
-print("Loading context images …")
-CONTEXTS = [img for _, img in load_images(CONTEXT_DIR)]
-print(f"  {len(CONTEXTS)} context images loaded")
+    Symbols are sorted by area, largest first.  With *cache* set the decoded
+    pixels are served from a memory-mapped atlas, rebuilt when any source
+    file is added, removed or modified; ``cache=None`` always decodes.
+    """
+    fingerprint = _asset_fingerprint(symbol_dir, context_dir)
+    if cache is not None:
+        atlas = _read_atlas(cache, fingerprint)
+        if atlas is not None:
+            return atlas
+
+    symbols = load_images(symbol_dir)
+    # sort by area descending so big ones placed first
+    symbols.sort(key=lambda it: it[1].shape[0] * it[1].shape[1], reverse=True)
+    contexts = load_images(context_dir)
+    if cache is not None:
+        try:
+            _write_atlas(cache, fingerprint, symbols, contexts)
+        except OSError as exc:
+            print(f"⚠️ Could not write asset cache {cache}: {exc}")
+    return ([(fname, Sprite(img, class_id_from_file(fname))) for fname, img in symbols],
+            [Sprite(img) for _, img in contexts])
+
+def rotate_image(img, angle):
+    """Rotate *img* counter-clockwise by *angle* degrees on an enlarged canvas.
+
+    Multiples of 90° are exact (``np.rot90``); other angles are resampled
+    once and the uncovered corners get alpha 0.
+    """
+    if angle % 90 == 0:
+        return np.ascontiguousarray(np.rot90(img, (angle // 90) % 4))
+    h, w = img.shape[:2]
+    m = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    cos, sin = abs(m[0, 0]), abs(m[0, 1])
+    nw, nh = int(np.ceil(h * sin + w * cos)), int(np.ceil(h * cos + w * sin))
+    m[0, 2] += nw / 2 - w / 2
+    m[1, 2] += nh / 2 - h / 2
+    return cv2.warpAffine(img, m, (nw, nh), flags=cv2.INTER_LINEAR,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0, 0))
+
+def crop_to_alpha(img):
+    """Crop a BGRA image to the bounding box of its non-transparent pixels."""
+    ys, xs = np.nonzero(img[:, :, 3])
+    if ys.size == 0:
+        return img
+    return np.ascontiguousarray(img[ys.min():ys.max() + 1, xs.min():xs.max() + 1])
+
+def symbol_variants(img, scales=VARIANT_SCALES, rotations=VARIANT_ROTATIONS, flip=VARIANT_FLIP):
+    """Every scale × flip × rotation of *img*, each cropped to its visible pixels.
+
+    The identity variant is *img* itself, so its box is the same as without
+    variants.  Each variant is resampled at most twice (resize, then a
+    non-right-angle rotation).
+    """
+    bgra = img if img.shape[2] == 4 else cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
+    h, w = img.shape[:2]
+    out = []
+    for s in scales:
+        if s == 1:
+            base = bgra
+        else:
+            size = (max(1, round(w * s)), max(1, round(h * s)))
+            base = cv2.resize(bgra, size, interpolation=cv2.INTER_AREA if s < 1 else cv2.INTER_LINEAR)
+        for flipped in ((False, True) if flip else (False,)):
+            b = base[:, ::-1] if flipped else base
+            for angle in rotations:
+                if s == 1 and not flipped and angle % 360 == 0:
+                    out.append(img)
+                else:
+                    out.append(crop_to_alpha(rotate_image(np.ascontiguousarray(b), angle)))
+    return out
+
+def load_variants(symbols, scales=VARIANT_SCALES, rotations=VARIANT_ROTATIONS, flip=VARIANT_FLIP,
+                  cache=None, fingerprint=None):
+    """Return one list of variant :class:`Sprite` objects per symbol.
+
+    Built once per asset set and variant configuration; with *cache* the
+    pixels are stored in (and memory-mapped from) an atlas next to the
+    asset atlas, keyed on *fingerprint* and the configuration.
+    """
+    config = [list(scales), list(rotations), bool(flip)]
+    per_symbol = len(scales) * len(rotations) * (2 if flip else 1)
+    if per_symbol == 1 and config[0] == [1] and config[1][0] % 360 == 0:
+        return [[s] for _, s in symbols]
+    key = [fingerprint, config]
+    flat = None
+    if cache is not None:
+        atlas = _read_atlas(cache, key)
+        flat = None if atlas is None else atlas[0]
+    if flat is None:
+        raw = [(name, v) for name, s in symbols
+               for v in symbol_variants(s.img, scales, rotations, flip)]
+        if cache is not None:
+            try:
+                _write_atlas(cache, key, raw, [])
+            except OSError as exc:
+                print(f"⚠️ Could not write variant cache {cache}: {exc}")
+        flat = [(name, Sprite(v, class_id_from_file(name))) for name, v in raw]
+    return [[s for _, s in flat[k:k + per_symbol]] for k in range(0, len(flat), per_symbol)]
 
 # ---------------------------------------------------------------------------
 # 7. Synthetic generator
 # ---------------------------------------------------------------------------
 
-def generate_image(rng: random.Random):
-    canvas = np.full((IMG_H, IMG_W, 3), BACKGROUND_RGB, np.uint8)
-    labels, occupied = [], []
-
-    for fname, img in SYMBOLS:
-        h, w = img.shape[:2]
-        maxx, maxy = IMG_W - w, IMG_H - h
-        placed = False
-        for _ in range(MAX_PLACEMENT_TRIES):
-            x, y = rng.randint(0, maxx), rng.randint(0, maxy)
-            if any(is_overlapping(x, y, w, h, ox, oy, ow, oh) for ox, oy, ow, oh in occupied):
+class SyntheticGenerator:
+    """Composes synthetic canvases from symbol and context images.
+
+    Nothing is read from disk until :attr:`symbols` or :attr:`contexts` is
+    first accessed (or :meth:`generate` is called).  Instances are picklable;
+    the loaded assets are dropped and re-mapped from the atlas on unpickling.
+    With more than one variant per symbol (*variant_scales*,
+    *variant_rotations*, *variant_flip*) each placement picks one of the
+    precomputed :attr:`variants` at random.
+    """
+
+    def __init__(self, symbol_dir=GROUND_TRUTH_DIR, context_dir=CONTEXT_DIR,
+                 asset_cache=ASSET_CACHE, img_w=IMG_W, img_h=IMG_H,
+                 background=BACKGROUND_RGB, max_placement_tries=MAX_PLACEMENT_TRIES,
+                 grid_cell=GRID_CELL, variant_scales=VARIANT_SCALES,
+                 variant_rotations=VARIANT_ROTATIONS, variant_flip=VARIANT_FLIP):
+        self.symbol_dir, self.context_dir = Path(symbol_dir), Path(context_dir)
+        self.asset_cache = None if asset_cache is None else Path(asset_cache)
+        self.img_w, self.img_h = img_w, img_h
+        self.background = tuple(background)
+        self.max_placement_tries, self.grid_cell = max_placement_tries, grid_cell
+        self.variant_scales, self.variant_rotations = tuple(variant_scales), tuple(variant_rotations)
+        self.variant_flip = variant_flip
+        self._assets = None
+        self._variants = None
+        self._background = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_assets"] = state["_variants"] = state["_background"] = None
+        return state
+
+    def load(self):
+        """Load the assets now (e.g. before forking workers)."""
+        if self._assets is None:
+            print("Loading symbols and context images …")
+            symbols, contexts = load_assets(self.symbol_dir, self.context_dir, self.asset_cache)
+            if not symbols:
+                raise FileNotFoundError(f"No symbols found in {self.symbol_dir}")
+            print(f"  {len(symbols)} symbols, {len(contexts)} context images loaded")
+            self._assets = symbols, contexts
+            self.variants  # built here so forked workers share them
+        return self
+
+    @property
+    def symbols(self):
+        return self.load()._assets[0]
+
+    @property
+    def contexts(self):
+        return self.load()._assets[1]
+
+    @property
+    def variants(self):
+        """Per symbol (in :attr:`symbols` order) the list of its variant sprites."""
+        if self._variants is None:
+            cache = None if self.asset_cache is None \
+                else self.asset_cache.with_name(self.asset_cache.name + "_variants")
+            self._variants = load_variants(
+                self.symbols, self.variant_scales, self.variant_rotations, self.variant_flip,
+                cache, _asset_fingerprint(self.symbol_dir))
+        return self._variants
+
+    def new_canvas(self):
+        return np.empty((self.img_h, self.img_w, 3), np.uint8)
+
+    def _background_template(self):
+        # filling from a template is a plain memcpy; broadcasting the
+        # colour tuple (what np.full does) is ~20x slower at this size
+        if self._background is None:
+            self._background = np.full((self.img_h, self.img_w, 3), self.background, np.uint8)
+        return self._background
+
+    def layout(self, rng: random.Random, stats=None, profile=None):
+        """Choose positions only; return ``(placements, labels)``.
+
+        ``placements`` is a list of ``(sprite, x, y)`` for :meth:`render`.
+        *rng* is consumed exactly as by :meth:`generate`, so the labels of a
+        seed can be computed without compositing its image.  A
+        :class:`Profile` passed as *profile* receives per-class placement
+        counters and the canvas fill ratio.
+        """
+        symbols, contexts, variants = self.symbols, self.contexts, self.variants
+        W, H = self.img_w, self.img_h
+        grid = OccupancyGrid(W, H, self.grid_cell, self.max_placement_tries)
+        placements, labels = [], []
+
+        for (fname, img), choices in zip(symbols, variants):
+            if len(choices) > 1:
+                img = choices[rng.randrange(len(choices))]
+            h, w = img.h, img.w
+            if profile is not None:
+                probes, scans = grid.n_probes, grid.n_scans
+            pos = grid.place(rng, w, h)
+            if profile is not None:
+                profile.count_symbol(CLASS_NAMES[img.class_id], grid.n_probes - probes,
+                                     grid.n_scans - scans, pos is not None)
+            if pos is None:
+                print(f"⚠️ Could not place {fname}")
                 continue
-            place_alpha(canvas, img, (x, y))
-            cx, cy = (x + w / 2) / IMG_W, (y + h / 2) / IMG_H
-            labels.append((class_id_from_file(fname), cx, cy, w / IMG_W, h / IMG_H))
-            occupied.append((x, y, w, h))
-            placed = True
-            break
-        if not placed:
-            print(f"⚠️ Could not place {fname}")
-
-    # optional context clutter
-    for ctx in CONTEXTS:
-        h, w = ctx.shape[:2]
-        maxx, maxy = IMG_W - w, IMG_H - h
-        for _ in range(50):
-            x, y = rng.randint(0, maxx), rng.randint(0, maxy)
-            if any(is_overlapping(x, y, w, h, ox, oy, ow, oh) for ox, oy, ow, oh in occupied):
+            x, y = pos
+            placements.append((img, x, y))
+            cx, cy = (x + w / 2) / W, (y + h / 2) / H
+            labels.append((img.class_id, cx, cy, w / W, h / H))
+        symbols_failed = grid.n_failed
+
+        # optional context clutter
+        for ctx in contexts:
+            pos = grid.place(rng, ctx.w, ctx.h)
+            if pos is not None:
+                placements.append((ctx, *pos))
+
+        if profile is not None:
+            profile.add_image(sum(s.w * s.h for s, _, _ in placements) / (W * H))
+        if stats is not None:
+            stats.update(
+                symbols_placed=len(labels),
+                symbols_failed=symbols_failed,
+                contexts_placed=len(contexts) - (grid.n_failed - symbols_failed),
+                contexts_failed=grid.n_failed - symbols_failed,
+                probes=grid.n_probes,
+                scans=grid.n_scans,
+            )
+        return placements, labels
+
+    def render(self, placements, out=None):
+        """Composite *placements* onto a fresh background; return the canvas."""
+        canvas = self.new_canvas() if out is None else out
+        np.copyto(canvas, self._background_template())
+        for sprite, x, y in placements:
+            place_alpha(canvas, sprite, (x, y))
+        return canvas
+
+    def generate(self, rng: random.Random, stats=None, out=None, profile=None, placements=None):
+        """Compose one synthetic canvas; return ``(canvas, labels)``.
+
+        If a dict is passed as *stats* it is filled with this image's placement
+        statistics (placed/failed counts, random probes, full scans, seconds).
+        Pass a buffer from :meth:`new_canvas` as *out* to render into it instead
+        of allocating a new canvas, and a :class:`Profile` as *profile* to
+        time layout and rendering separately.  A list passed as *placements*
+        receives the ``(sprite, x, y)`` placements of :meth:`layout`.
+        """
+        t0 = time.perf_counter()
+        placed, labels = self.layout(rng, stats, profile)
+        if profile is not None:
+            t1 = time.perf_counter()
+            profile.add_time("layout", t1 - t0)
+        if placements is not None:
+            placements.extend(placed)
+        canvas = self.render(placed, out)
+        if profile is not None:
+            profile.add_time("render", time.perf_counter() - t1)
+        if stats is not None:
+            stats["seconds"] = time.perf_counter() - t0
+        return canvas, labels
+
+_DEFAULT_GENERATOR = None
+
+def default_generator():
+    """Shared generator built from the module constants."""
+    global _DEFAULT_GENERATOR
+    if _DEFAULT_GENERATOR is None:
+        _DEFAULT_GENERATOR = SyntheticGenerator()
+    return _DEFAULT_GENERATOR
+
+def new_canvas():
+    return default_generator().new_canvas()
+
+def generate_image(rng: random.Random, stats=None, out=None, profile=None):
+    """``default_generator().generate(...)`` – kept for existing callers."""
+    return default_generator().generate(rng, stats, out, profile)
+
+def __getattr__(name):
+    # SYMBOLS / CONTEXTS used to be loaded at import time; resolve lazily
+    if name == "SYMBOLS":
+        return default_generator().symbols
+    if name == "CONTEXTS":
+        return default_generator().contexts
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# ---------------------------------------------------------------------------
+# 8. Output – encode/write stage
+# ---------------------------------------------------------------------------
+
+_CODECS = {
+    # name: (extension, cv2 flag, default quality)
+    "jpg": (".jpg", cv2.IMWRITE_JPEG_QUALITY, 95),
+    "png": (".png", cv2.IMWRITE_PNG_COMPRESSION, 3),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY, 95),
+    "raw": (".npy", None, None),
+}
+CODEC_SUFFIXES = {ext for ext, _, _ in _CODECS.values()}
+
+def encode_image(img, codec=CODEC, quality=QUALITY):
+    """Return ``(extension, bytes)`` for *img*.
+
+    *quality* is the JPEG/WebP quality or the PNG compression level; ``raw``
+    stores the uint8 array as ``.npy`` (no compression, fastest to load).
+    """
+    ext, flag, default = _CODECS[codec]
+    if flag is None:
+        buf = io.BytesIO()
+        np.save(buf, img, allow_pickle=False)
+        return ext, buf.getbuffer()
+    ok, data = cv2.imencode(ext, img, [flag, default if quality is None else quality])
+    if not ok:
+        raise ValueError(f"could not encode image as {codec}")
+    return ext, data
+
+def tile_origins(length, tile, overlap=TILE_OVERLAP):
+    """Evenly spaced start offsets of tiles covering ``[0, length)``.
+
+    The first tile starts at 0 and the last is flush with the edge; no two
+    neighbours overlap by less than *overlap*.
+    """
+    if length <= tile:
+        return [0]
+    step = max(1, int(tile * (1 - overlap)))
+    n = -(-(length - tile) // step) + 1
+    return [round(i * (length - tile) / (n - 1)) for i in range(n)]
+
+def tile_grid(width, height, tile, overlap=TILE_OVERLAP):
+    """``[(x0, y0, w, h)]`` of the overlapping tiles of a ``width``×``height`` canvas."""
+    tw, th = min(tile, width), min(tile, height)
+    return [(x0, y0, tw, th) for y0 in tile_origins(height, tile, overlap)
+            for x0 in tile_origins(width, tile, overlap)]
+
+def tile_labels(lbl, width, height, box, min_visibility=MIN_VISIBILITY):
+    """Clip canvas labels to the tile *box* ``(x0, y0, w, h)`` and normalise them to it.
+
+    A box is kept if at least *min_visibility* of its area lies inside the
+    tile.
+    """
+    x0, y0, tw, th = box
+    out = []
+    for c, cx, cy, bw, bh in lbl:
+        x1, y1 = (cx - bw / 2) * width, (cy - bh / 2) * height
+        x2, y2 = x1 + bw * width, y1 + bh * height
+        cx1, cy1 = max(x1, x0), max(y1, y0)
+        cx2, cy2 = min(x2, x0 + tw), min(y2, y0 + th)
+        if cx2 <= cx1 or cy2 <= cy1:
+            continue
+        if (cx2 - cx1) * (cy2 - cy1) < min_visibility * (x2 - x1) * (y2 - y1):
+            continue
+        out.append((c, ((cx1 + cx2) / 2 - x0) / tw, ((cy1 + cy2) / 2 - y0) / th,
+                    (cx2 - cx1) / tw, (cy2 - cy1) / th))
+    return out
+
+def format_labels(lbl) -> str:
+    return "".join(f"{c} {cx:.6f} {cy:.6f} {bw:.6f} {bh:.6f}\n" for c, cx, cy, bw, bh in lbl)
+
+def write_sample(index: int, img, lbl, out_img_dir=OUT_IMG_DIR, out_label_dir=OUT_LABEL_DIR,
+                 codec=CODEC, quality=QUALITY):
+    ext, data = encode_image(img, codec, quality)
+    img_path = Path(out_img_dir) / f"synthetic_{index:04d}{ext}"
+    img_path.write_bytes(data)
+    (Path(out_label_dir) / f"synthetic_{index:04d}.txt").write_text(format_labels(lbl))
+    return img_path
+
+class SampleWriter:
+    """Encodes and writes samples on a thread pool behind a bounded queue.
+
+    The composing thread takes a canvas with :meth:`canvas`, renders into it
+    and hands it to :meth:`submit`; the canvas returns to the pool once it is
+    written.  While :attr:`shard` is set to a :class:`shards.ShardWriter`
+    samples are appended to it instead of written as separate files.  With
+    *tile* > 0 every canvas is written as overlapping ``tile``×``tile`` crops
+    (``synthetic_0007_t03.jpg``) with clipped labels instead, except that
+    with *val_every* > 0 every ``val_every``-th canvas is held out and written
+    whole to *out_val_img_dir*/*out_val_label_dir*.  With
+    ``queue_size`` images in flight both calls block, which is the
+    backpressure.  ``stats`` accumulates seconds per stage:
+    ``encode``/``write`` are summed over writer threads and ``stall`` is
+    the time the composer waited for a free canvas.  While :attr:`profile`
+    is set, image and label writes are also timed into it separately.  The
+    first encode/write error is re-raised by :meth:`flush`/:meth:`close`;
+    later samples are dropped until then.
+    """
+
+    def __init__(self, new_canvas, out_img_dir=OUT_IMG_DIR, out_label_dir=OUT_LABEL_DIR,
+                 codec=CODEC, quality=QUALITY, threads=WRITER_THREADS, queue_size=WRITE_QUEUE,
+                 tile=TILE, tile_overlap=TILE_OVERLAP, min_visibility=MIN_VISIBILITY,
+                 val_every=VAL_EVERY, out_val_img_dir=OUT_VAL_IMG_DIR, out_val_label_dir=OUT_VAL_LABEL_DIR):
+        self.out_img_dir, self.out_label_dir = Path(out_img_dir), Path(out_label_dir)
+        self.codec, self.quality = codec, quality
+        self.tile, self.tile_overlap, self.min_visibility = tile, tile_overlap, min_visibility
+        self.val_every = val_every
+        self.out_val_img_dir, self.out_val_label_dir = Path(out_val_img_dir), Path(out_val_label_dir)
+        self.shard = self.profile = None
+        self.stats = dict.fromkeys(("images", "tiles", "bytes", "encode", "write", "stall"), 0)
+        self._lock = threading.Lock()
+        self._error = None
+        self._jobs = queue.Queue()
+        self._free = queue.Queue()
+        for _ in range(queue_size + threads):
+            self._free.put(new_canvas())
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(threads)]
+        for t in self._threads:
+            t.start()
+
+    def canvas(self):
+        t0 = time.perf_counter()
+        buf = self._free.get()
+        stall = time.perf_counter() - t0
+        self.stats["stall"] += stall
+        if self.profile is not None:
+            self.profile.add_time("stall", stall)
+        return buf
+
+    def submit(self, index, img, lbl):
+        self._jobs.put((index, img, lbl))
+
+    def _write_file(self, stem, img, lbl, img_dir=None, label_dir=None):
+        """Encode and write one image + label file; returns ``(bytes, t_encode, t_image, t_labels)``."""
+        t0 = time.perf_counter()
+        ext, data = encode_image(img, self.codec, self.quality)
+        t1 = time.perf_counter()
+        (img_dir or self.out_img_dir).joinpath(f"{stem}{ext}").write_bytes(data)
+        t2 = time.perf_counter()
+        (label_dir or self.out_label_dir).joinpath(f"{stem}.txt").write_text(format_labels(lbl))
+        return len(data), t1 - t0, t2 - t1, time.perf_counter() - t2
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                self._jobs.task_done()
+                return
+            index, img, lbl = job
+            n_tiles = 0
+            try:
+                if self._error is not None:
+                    continue
+                if self.shard is not None:
+                    t0 = time.perf_counter()
+                    ext, data = encode_image(img, self.codec, self.quality)
+                    t1 = time.perf_counter()
+                    self.shard.add(index, data, lbl)
+                    parts = [(len(data), t1 - t0, time.perf_counter() - t1, 0.0)]
+                elif self.tile > 0 and self.val_every > 0 and index % self.val_every == 0:
+                    parts = [self._write_file(f"synthetic_{index:04d}", img, lbl,
+                                              self.out_val_img_dir, self.out_val_label_dir)]
+                elif self.tile > 0:
+                    H, W = img.shape[:2]
+                    parts = [self._write_file(f"synthetic_{index:04d}_t{k:02d}",
+                                              img[y0:y0 + th, x0:x0 + tw],
+                                              tile_labels(lbl, W, H, (x0, y0, tw, th), self.min_visibility))
+                             for k, (x0, y0, tw, th) in enumerate(
+                                 tile_grid(W, H, self.tile, self.tile_overlap))]
+                    n_tiles = len(parts)
+                else:
+                    parts = [self._write_file(f"synthetic_{index:04d}", img, lbl)]
+                n_bytes, t_enc, t_img, t_lbl = (sum(col) for col in zip(*parts))
+                profile = self.profile
+                if profile is not None:
+                    profile.add_time("encode", t_enc)
+                    profile.add_time("write_image", t_img)
+                    profile.add_time("write_labels", t_lbl)
+                with self._lock:
+                    self.stats["images"] += 1
+                    self.stats["tiles"] += n_tiles
+                    self.stats["bytes"] += n_bytes
+                    self.stats["encode"] += t_enc
+                    self.stats["write"] += t_img + t_lbl
+            except Exception as exc:
+                # keep draining the queue so flush()/close() return and report it
+                with self._lock:
+                    if self._error is None:
+                        self._error = exc
+            finally:
+                self._free.put(img)
+                self._jobs.task_done()
+
+    def flush(self):
+        """Block until every submitted sample is on disk; re-raise a writer error."""
+        self._jobs.join()
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            for _ in self._threads:
+                self._jobs.put(None)
+            for t in self._threads:
+                t.join()
+
+# ---------------------------------------------------------------------------
+# 9. Manifest – incremental regeneration
+# ---------------------------------------------------------------------------
+
+def _digest(obj) -> str:
+    return hashlib.sha1(json.dumps(obj, sort_keys=True).encode()).hexdigest()
+
+def file_hashes(folder: Path):
+    """``[(file_name, sha1)]`` in :func:`image_files` order (the order assets load in)."""
+    return [(p.name, hashlib.sha1(p.read_bytes()).hexdigest()) for p in image_files(Path(folder))]
+
+def input_keys(gen, codec=CODEC, quality=QUALITY):
+    """Hashes of everything a sample depends on, split by what it invalidates.
+
+    ``layout`` covers the canvas config and the order and sizes of the
+    assets (with the seed it fixes every position), ``pixels`` the
+    background, ``labels`` the symbol → class id mapping and ``config`` the
+    output codec; these are the same for all samples.  The second value,
+    ``{"order", "hashes"}``, lists the content hash of every asset in
+    :func:`asset_index` order; each sample records which of them it
+    places, so editing one asset only invalidates the samples showing it.
+    """
+    gen.load()
+    symbol_hashes, context_hashes = file_hashes(gen.symbol_dir), file_hashes(gen.context_dir)
+    by_name = dict(symbol_hashes)
+    order = [n for n, _ in gen.symbols] + [f"context/{n}" for n, _ in context_hashes]
+    hashes = [by_name.get(n) for n, _ in gen.symbols] + [h for _, h in context_hashes]
+    return {
+        "config": _digest([codec, quality]),
+        "layout": _digest([gen.img_w, gen.img_h, gen.max_placement_tries, gen.grid_cell,
+                           [gen.variant_scales, gen.variant_rotations, gen.variant_flip],
+                           [(n, s.w, s.h) for n, s in gen.symbols],
+                           [(c.w, c.h) for c in gen.contexts]]),
+        "pixels": _digest(gen.background),
+        "labels": _digest([(n, s.class_id) for n, s in gen.symbols]),
+    }, {"order": order, "hashes": hashes}
+
+def asset_index(gen):
+    """``{id(sprite): k}`` – symbols (with all their variants) first, then contexts."""
+    index = {}
+    for k, ((_, sprite), choices) in enumerate(zip(gen.symbols, gen.variants)):
+        for s in (sprite, *choices):
+            index[id(s)] = k
+    for k, ctx in enumerate(gen.contexts, len(gen.symbols)):
+        index[id(ctx)] = k
+    return index
+
+def placed_mask(placements, index) -> str:
+    """The assets used by *placements* as a hex bit mask over :func:`asset_index`."""
+    mask = 0
+    for sprite, _, _ in placements:
+        mask |= 1 << index[id(sprite)]
+    return format(mask, "x")
+
+def _read_manifest(path: Path):
+    try:
+        return json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return {"samples": {}}
+
+def _write_manifest(path: Path, manifest):
+    tmp = Path(path).with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, separators=(",", ":")))
+    tmp.replace(path)
+
+_OUTPUT_NAME = re.compile(r"synthetic_(\d+)(?:_t(\d+))?(\.\w+)$")
+
+def stale_outputs(num_images, out_img_dir=OUT_IMG_DIR, out_label_dir=OUT_LABEL_DIR, codec=CODEC,
+                  tiles=0, keep=None):
+    """Generated files (whole canvases and tiles) that the run would not write.
+
+    A file is stale if its index is beyond *num_images*, *keep* (called
+    with the index) is false, it was written with another codec, or it is
+    a tile although *tiles* is 0 – or a whole canvas or a tile number
+    ``>= tiles`` when *tiles* is the number of tiles per canvas.
+    """
+    ext = _CODECS[codec][0]
+    stale = []
+    for folder, wanted in ((Path(out_img_dir), ext), (Path(out_label_dir), ".txt")):
+        if not folder.is_dir():
+            continue
+        for p in folder.iterdir():
+            m = _OUTPUT_NAME.match(p.name)
+            if not m or (m[3] not in CODEC_SUFFIXES and m[3] != ".txt"):
                 continue
-            place_alpha(canvas, ctx, (x, y))
-            occupied.append((x, y, w, h))
-            break
+            i = int(m[1])
+            tile_ok = int(m[2]) < tiles if m[2] is not None else tiles == 0
+            if i >= num_images or m[3] != wanted or not tile_ok or (keep is not None and not keep(i)):
+                stale.append(p)
+    return stale
+
+def plan_regeneration(gen, num_images, base_seed=BASE_SEED, out_img_dir=OUT_IMG_DIR,
+                      out_label_dir=OUT_LABEL_DIR, codec=CODEC, quality=QUALITY, manifest=MANIFEST):
+    """Compare the manifest with the current inputs.
+
+    Returns ``(full, labels_only, new_manifest)``: the indices that need a
+    new image, those whose image is still valid but whose label file must
+    be rewritten (only the class mapping changed), and the manifest to
+    save once they are written.  Missing output files count as changed.
+    """
+    keys, assets = input_keys(gen, codec, quality)
+    old_manifest = _read_manifest(manifest)
+    old = old_manifest.get("samples", {})
+    current = dict(zip(assets["order"], assets["hashes"]))
+    old_assets = old_manifest.get("assets", {})
+    # assets whose content changed, as a mask over the old order
+    changed = sum(1 << k for k, (n, h) in enumerate(zip(old_assets.get("order", ()),
+                                                         old_assets.get("hashes", ())))
+                  if current.get(n) != h)
+    ext = _CODECS[codec][0]
+    full, labels_only, samples = [], [], {}
+    for i in range(num_images):
+        seed = image_seed(base_seed, i)
+        rec = old.get(str(i)) or {}
+        samples[str(i)] = {"seed": seed, **keys, "placed": rec.get("placed")}
+        outputs_exist = (Path(out_img_dir) / f"synthetic_{i:04d}{ext}").exists() \
+            and (Path(out_label_dir) / f"synthetic_{i:04d}.txt").exists()
+        if not rec or not outputs_exist or rec.get("seed") != seed or rec.get("placed") is None \
+                or any(rec.get(k) != keys[k] for k in ("config", "layout", "pixels")) \
+                or int(rec["placed"], 16) & changed:
+            full.append(i)
+            samples[str(i)]["placed"] = None  # filled in from the worker
+        elif rec.get("labels") != keys["labels"]:
+            labels_only.append(i)
+    return full, labels_only, {"assets": assets, "samples": samples}
 
-    return canvas, labels
+def _ranges(indices, step):
+    """Split sorted *indices* into contiguous ``(start, stop)`` runs of at most *step*."""
+    out = []
+    for i in indices:
+        if out and out[-1][1] == i and i - out[-1][0] < step:
+            out[-1][1] = i + 1
+        else:
+            out.append([i, i + 1])
+    return [tuple(r) for r in out]
+
+def sync_dataset_yaml(path=DATASET_YAML):
+    """Rewrite ``nc``/``names`` in *path* if they differ from ``final_class_names``.
+
+    Other keys and comments are kept.  Returns True if the file changed.
+    """
+    path = Path(path)
+    if not path.exists():
+        return False
+    lines = path.read_text(encoding="utf-8").splitlines()
+    keep, names, nc, in_names = [], {}, None, False
+    for line in lines:
+        s = line.strip()
+        if in_names and s.startswith("- "):
+            names[s[2:].split("#")[0].strip().strip("'\"")] = line  # keeps inline comments
+            continue
+        in_names = False
+        if s.startswith("names:"):
+            in_names = True
+        elif s.startswith("nc:"):
+            nc = int(s.split(":", 1)[1].split("#")[0])
+        else:
+            keep.append(line)
+    if list(names) == final_class_names and nc == len(final_class_names):
+        return False
+    while keep and not keep[-1].strip():
+        keep.pop()
+    body = [f"nc: {len(final_class_names)}", "", "names:"] + [names.get(n, f"  - {n}")
+                                                               for n in final_class_names]
+    path.write_text("\n".join(keep + [""] + body) + "\n", encoding="utf-8")
+    print(f"⚠️ {path}: class list updated to {len(final_class_names)} classes "
+          f"(was {nc}) – label files are rewritten to match")
+    return True
 
 # ---------------------------------------------------------------------------
-# 8. Main entry point
+# 10. Main entry point
 # ---------------------------------------------------------------------------
 
-def main():
-    rng = random.Random()
-    for i in range(NUM_IMAGES):
-        img, lbl = generate_image(rng)
-        img_path = OUT_IMG_DIR / f"synthetic_{i:04d}.jpg"
-        lbl_path = OUT_LABEL_DIR / f"synthetic_{i:04d}.txt"
-        cv2.imwrite(str(img_path), img, [cv2.IMWRITE_JPEG_QUALITY, 95])
-        with open(lbl_path, "w") as f:
-            for c, cx, cy, bw, bh in lbl:
-                f.write(f"{c} {cx:.6f} {cy:.6f} {bw:.6f} {bh:.6f}\n")
-        if (i + 1) % 10 == 0 or i == 0:
-            print(f"Generated {i + 1}/{NUM_IMAGES} → {img_path.name}")
+def image_seed(base_seed: int, index: int) -> int:
+    """Seed for image *index* – independent of worker count and order."""
+    return int(np.random.SeedSequence([base_seed, index]).generate_state(1, np.uint64)[0])
+
+_WORKER_GENERATOR = None
+_WORKER_WRITER = None
+_WORKER_PROFILE = False
+_WORKER_ASSETS = None
+
+def _init_worker(gen, writer_args, profile=False):
+    global _WORKER_GENERATOR, _WORKER_WRITER, _WORKER_PROFILE, _WORKER_ASSETS
+    _WORKER_GENERATOR = gen
+    _WORKER_WRITER = SampleWriter(gen.new_canvas, **writer_args)
+    _WORKER_PROFILE = profile
+    _WORKER_ASSETS = asset_index(gen)
+
+def _generate_range(task):
+    """Pool worker: generate and write images ``start`` … ``stop - 1``.
+
+    With ``labels_only`` set only the label files are rewritten.
+
+    Returns ``(start, stop, stage_seconds)`` where the stage timings cover
+    only this chunk; ``stage_seconds["placed"]`` maps each index to its
+    :func:`placed_mask` and, when profiling, ``stage_seconds["profile"]`` is
+    the chunk's :meth:`Profile.to_dict`.
+    """
+    start, stop, base_seed, shard, labels_only = task
+    gen, writer = _WORKER_GENERATOR, _WORKER_WRITER
+    if labels_only:
+        # layout only – the image on disk is still valid
+        t0 = time.perf_counter()
+        for i in range(start, stop):
+            lbl = gen.layout(random.Random(image_seed(base_seed, i)))[1]
+            (writer.out_label_dir / f"synthetic_{i:04d}.txt").write_text(format_labels(lbl))
+        return start, stop, {"labels_only": stop - start, "relabel": time.perf_counter() - t0}
+    if shard is not None:
+        shard_dir, shard_id = shard
+        writer.shard = shards.ShardWriter(shard_dir, shard_id, start, stop - start,
+                                          _CODECS[writer.codec][0])
+    profile = writer.profile = Profile() if _WORKER_PROFILE else None
+    before = dict(writer.stats)
+    compose = 0.0
+    placed = {}
+    for i in range(start, stop):
+        canvas = writer.canvas()
+        placements = []
+        t0 = time.perf_counter()
+        img, lbl = gen.generate(random.Random(image_seed(base_seed, i)), out=canvas, profile=profile,
+                                placements=placements)
+        compose += time.perf_counter() - t0
+        placed[str(i)] = placed_mask(placements, _WORKER_ASSETS)
+        writer.submit(i, img, lbl)
+    writer.flush()
+    writer.profile = None
+    if shard is not None:
+        writer.shard.close()
+        writer.shard = None
+    stats = {k: writer.stats[k] - before[k] for k in before}
+    stats["compose"] = compose
+    stats["placed"] = placed
+    if profile is not None:
+        stats["profile"] = profile.to_dict()
+    return start, stop, stats
+
+def report_throughput(stats, wall, threads):
+    """Print images/s per stage so the bottleneck is obvious."""
+    n = stats.get("images", 0)
+    def rate(key):
+        return n / stats[key] if stats.get(key) else float("inf")
+    print(f"Throughput: {n / wall:.1f} img/s overall ({n} images in {wall:.1f} s)")
+    if stats.get("tiles"):
+        print(f"  tiles   : {stats['tiles']} written ({stats['tiles'] / wall:.1f} tiles/s)")
+    print(f"  compose : {rate('compose'):8.1f} img/s per process")
+    print(f"  encode  : {rate('encode'):8.1f} img/s per thread ({threads} threads/process)")
+    print(f"  write   : {rate('write'):8.1f} img/s per thread, {stats.get('bytes', 0) / 2**20:.1f} MiB")
+    print(f"  composer stalled on writers for {stats.get('stall', 0):.2f} s")
+
+def _pool_context():
+    # fork shares the loaded assets copy-on-write; spawn (Windows/macOS
+    # default) unpickles the generator and maps the asset atlas per worker.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("fork" if "fork" in methods else None)
+
+def run(gen=None, num_images=NUM_IMAGES, out_img_dir=OUT_IMG_DIR, out_label_dir=OUT_LABEL_DIR,
+        num_workers=NUM_WORKERS, base_seed=BASE_SEED, codec=CODEC, quality=QUALITY,
+        writer_threads=WRITER_THREADS, queue_size=WRITE_QUEUE,
+        shard_size=SHARD_SIZE, out_shard_dir=OUT_SHARD_DIR, profile=False, profile_json=None,
+        incremental=False, manifest=MANIFEST, tile=TILE, tile_overlap=TILE_OVERLAP,
+        min_visibility=MIN_VISIBILITY, val_every=VAL_EVERY,
+        out_val_img_dir=OUT_VAL_IMG_DIR, out_val_label_dir=OUT_VAL_LABEL_DIR, prune=False):
+    """Generate and write ``num_images`` samples with *gen* (default generator).
+
+    With *shard_size* > 0 every task writes one shard of that many samples
+    to *out_shard_dir* instead of per-sample files.  Otherwise *manifest*
+    records the inputs of every sample, and with *incremental* only the
+    samples whose inputs changed are rewritten (see
+    :func:`plan_regeneration`).  With *incremental* or *prune*, generated
+    files that the run would not write (see :func:`stale_outputs`) are
+    deleted; otherwise they are left alone.  With *tile* > 0
+    every canvas is written as overlapping tiles (see :class:`SampleWriter`)
+    and no manifest is kept.  Returns the
+    per-stage statistics summed over all workers.  With *profile* (or a *profile_json*
+    path) a :class:`Profile` of the whole run is printed, returned as
+    ``totals["profile"]`` and optionally written to *profile_json*.
+    """
+    gen = gen or default_generator()
+    prof = Profile() if profile or profile_json else None
+    t_load = time.perf_counter()
+    gen.load()
+    if prof is not None:
+        prof.add_time("load", time.perf_counter() - t_load)
+    if shard_size > 0 and tile > 0:
+        raise ValueError("tiles cannot be written to shards")
+    if shard_size > 0:
+        Path(out_shard_dir).mkdir(parents=True, exist_ok=True)
+    else:
+        Path(out_img_dir).mkdir(parents=True, exist_ok=True)
+        Path(out_label_dir).mkdir(parents=True, exist_ok=True)
+    if tile > 0 and val_every > 0:
+        Path(out_val_img_dir).mkdir(parents=True, exist_ok=True)
+        Path(out_val_label_dir).mkdir(parents=True, exist_ok=True)
+    writer_args = dict(out_img_dir=out_img_dir, out_label_dir=out_label_dir, codec=codec,
+                       quality=quality, threads=writer_threads, queue_size=queue_size,
+                       tile=tile, tile_overlap=tile_overlap, min_visibility=min_visibility,
+                       val_every=val_every, out_val_img_dir=out_val_img_dir,
+                       out_val_label_dir=out_val_label_dir)
+    step = shard_size if shard_size > 0 else CHUNK_SIZE
+    if tile > 0:
+        if incremental:
+            print("⚠️ --incremental does not apply to tiles; writing every canvas")
+        tasks = [(s, min(s + step, num_images), base_seed, None, False)
+                 for s in range(0, num_images, step)]
+        new_manifest = None
+    elif shard_size > 0:
+        if incremental:
+            print("⚠️ --incremental does not apply to shards; writing every shard")
+        tasks = [(s, min(s + step, num_images), base_seed, (out_shard_dir, s // step), False)
+                 for s in range(0, num_images, step)]
+        new_manifest = None
+    else:
+        full, labels_only, new_manifest = plan_regeneration(
+            gen, num_images, base_seed, out_img_dir, out_label_dir, codec, quality, manifest)
+        if not incremental:
+            full, labels_only = list(range(num_images)), []
+        if incremental:
+            print(f"Incremental: {len(full)} images, {len(labels_only)} label files to rewrite, "
+                  f"{num_images - len(full) - len(labels_only)} unchanged")
+            # drop the entries being rewritten first, so an interrupted run redoes them
+            kept = _read_manifest(manifest).get("samples", {})
+            for i in full + labels_only:
+                kept.pop(str(i), None)
+            _write_manifest(manifest, {"assets": new_manifest["assets"], "samples": {
+                k: v for k, v in kept.items() if int(k) < num_images}})
+        tasks = [(a, b, base_seed, None, False) for a, b in _ranges(full, step)] \
+            + [(a, b, base_seed, None, True) for a, b in _ranges(labels_only, step * 32)]
+    if shard_size <= 0 and (incremental or prune):
+        if tile > 0:
+            held_out = lambda i: val_every > 0 and i % val_every == 0
+            stale = stale_outputs(num_images, out_img_dir, out_label_dir, codec,
+                                  len(tile_grid(gen.img_w, gen.img_h, tile, tile_overlap)),
+                                  keep=lambda i: not held_out(i))
+            if val_every > 0:
+                stale += stale_outputs(num_images, out_val_img_dir, out_val_label_dir, codec,
+                                       keep=held_out)
+        else:
+            stale = stale_outputs(num_images, out_img_dir, out_label_dir, codec)
+        for p in stale:
+            p.unlink()
+            print(f"Removed stale {p}")
+    total = sum(t[1] - t[0] for t in tasks)
+    totals, done = {}, 0
+    t0 = time.perf_counter()
+    if not tasks:
+        pool, results = None, []
+    elif num_workers <= 1 or len(tasks) <= 1:
+        _init_worker(gen, writer_args, prof is not None)
+        results = map(_generate_range, tasks)
+        pool = None
+    else:
+        pool = _pool_context().Pool(min(num_workers, len(tasks)),
+                                    initializer=_init_worker, initargs=(gen, writer_args, prof is not None))
+        results = pool.imap_unordered(_generate_range, tasks)
+    try:
+        for start, stop, stats in results:
+            if new_manifest is not None and "placed" in stats:
+                for k, mask in stats["placed"].items():
+                    new_manifest["samples"][k]["placed"] = mask
+            stats.pop("placed", None)
+            if prof is not None and "profile" in stats:
+                prof.merge(stats.pop("profile"))
+            for k, v in stats.items():
+                totals[k] = totals.get(k, 0) + v
+            done += stop - start
+            print(f"Generated {done}/{total} (indices {start}–{stop - 1})")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        elif tasks:
+            _WORKER_WRITER.close()
+    if new_manifest is not None:
+        _write_manifest(manifest, new_manifest)
     print("✅ Synthetic dataset generation complete")
+    report_throughput(totals, time.perf_counter() - t0, writer_threads)
+    if prof is not None:
+        print(prof.summary())
+        totals["profile"] = prof.to_dict()
+        if profile_json:
+            Path(profile_json).write_text(json.dumps(totals, indent=2))
+            print(f"Profile written to {profile_json}")
+    return totals
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Generate a synthetic YOLO dataset of HVAC/BMS symbols.")
+    ap.add_argument("--symbols", type=Path, default=GROUND_TRUTH_DIR, help="symbol PNG folder")
+    ap.add_argument("--contexts", type=Path, default=CONTEXT_DIR, help="context clutter folder")
+    ap.add_argument("--out-images", type=Path, default=OUT_IMG_DIR)
+    ap.add_argument("--out-labels", type=Path, default=OUT_LABEL_DIR)
+    ap.add_argument("--asset-cache", type=Path, default=ASSET_CACHE,
+                    help="atlas path prefix (see load_assets)")
+    ap.add_argument("--no-asset-cache", action="store_true", help="always decode the source images")
+    ap.add_argument("-n", "--num-images", type=int, default=NUM_IMAGES)
+    ap.add_argument("--width", type=int, default=IMG_W)
+    ap.add_argument("--height", type=int, default=IMG_H)
+    ap.add_argument("--max-placement-tries", type=int, default=MAX_PLACEMENT_TRIES,
+                    help="random probes per symbol before a full free-space scan")
+    ap.add_argument("--grid-cell", type=int, default=GRID_CELL, help="occupancy grid cell size (px)")
+    ap.add_argument("--scales", type=float, nargs="+", default=VARIANT_SCALES,
+                    help="symbol scale variants, e.g. 0.75 1 1.25")
+    ap.add_argument("--rotations", type=int, nargs="+", default=VARIANT_ROTATIONS,
+                    help="symbol rotation variants in degrees, e.g. 0 90 180 270")
+    ap.add_argument("--flip", action="store_true", help="add mirrored symbol variants")
+    ap.add_argument("-j", "--workers", type=int, default=NUM_WORKERS)
+    ap.add_argument("--seed", type=int, default=BASE_SEED, help="base seed for per-image seeds")
+    ap.add_argument("--codec", choices=sorted(_CODECS), default=CODEC)
+    ap.add_argument("--quality", type=int, default=QUALITY,
+                    help="JPEG/WebP quality or PNG compression level (codec default if omitted)")
+    ap.add_argument("--writer-threads", type=int, default=WRITER_THREADS)
+    ap.add_argument("--queue-size", type=int, default=WRITE_QUEUE,
+                    help="composed images allowed to wait for a writer")
+    ap.add_argument("--shard-size", type=int, default=SHARD_SIZE,
+                    help="write shards of this many samples instead of one file per sample")
+    ap.add_argument("--out-shards", type=Path, default=OUT_SHARD_DIR)
+    ap.add_argument("--tile", type=int, default=TILE,
+                    help="write overlapping TILE×TILE crops of each canvas instead (e.g. 640; 0 = off)")
+    ap.add_argument("--tile-overlap", type=float, default=TILE_OVERLAP,
+                    help="fraction of a tile shared with its neighbour")
+    ap.add_argument("--min-visibility", type=float, default=MIN_VISIBILITY,
+                    help="keep a clipped box if at least this fraction of it is inside the tile")
+    ap.add_argument("--val-every", type=int, default=VAL_EVERY,
+                    help="with --tile: keep every N-th canvas whole in --out-val-images/--out-val-labels")
+    ap.add_argument("--out-val-images", type=Path, default=OUT_VAL_IMG_DIR)
+    ap.add_argument("--out-val-labels", type=Path, default=OUT_VAL_LABEL_DIR)
+    ap.add_argument("--incremental", action="store_true",
+                    help="rewrite only samples whose inputs changed since the last run (see --manifest)")
+    ap.add_argument("--manifest", type=Path, default=MANIFEST)
+    ap.add_argument("--prune", action="store_true",
+                    help="delete generated files beyond --num-images or in another codec "
+                         "(implied by --incremental)")
+    ap.add_argument("--dataset-yaml", type=Path, default=DATASET_YAML,
+                    help="nc/names here are kept in sync with the class list")
+    ap.add_argument("--profile", action="store_true",
+                    help="print stage timings, per-class placement counters and canvas fill")
+    ap.add_argument("--profile-json", type=Path, default=None,
+                    help="also write the run statistics and profile as JSON (implies --profile)")
+    return ap.parse_args(argv)
+
+def generator_from_args(args):
+    return SyntheticGenerator(
+        symbol_dir=args.symbols, context_dir=args.contexts,
+        asset_cache=None if args.no_asset_cache else args.asset_cache,
+        img_w=args.width, img_h=args.height,
+        max_placement_tries=args.max_placement_tries, grid_cell=args.grid_cell,
+        variant_scales=args.scales, variant_rotations=args.rotations, variant_flip=args.flip)
+
+def main(argv=None):
+    args = parse_args(argv)
+    sync_dataset_yaml(args.dataset_yaml)
+    return run(generator_from_args(args), args.num_images, args.out_images, args.out_labels,
+        args.workers, args.seed, args.codec, args.quality, args.writer_threads, args.queue_size,
+        args.shard_size, args.out_shards, args.profile, args.profile_json,
+        args.incremental, args.manifest, args.tile, args.tile_overlap, args.min_visibility,
+        args.val_every, args.out_val_images, args.out_val_labels, args.prune)
 
 if __name__ == "__main__":
     main()
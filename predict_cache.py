@@ -0,0 +1,135 @@
+"""
+Content-addressed cache of raw YOLO detections.
+
+An entry is keyed by the SHA-256 of the image bytes, the hash of the
+weights and the parameters that change the model output (``imgsz`` and
+the NMS ``iou``).  Detections are stored at the low ``RAW_CONF`` floor, so
+any higher confidence threshold is applied afterwards without running the
+model again (greedy NMS only suppresses lower-scoring boxes, so filtering
+after NMS gives the same boxes as filtering before it).
+
+Entries are small ``.npz`` files under ``cache_dir``; the cache is bounded
+by total size and evicts the least recently used entries first (the file
+mtime is refreshed on every hit).
+"""
+
+import io
+import os
+import json
+import hashlib
+import zipfile
+import threading
+from pathlib import Path
+
+import numpy as np
+
+CACHE_DIR = Path('.predict_cache')
+MAX_BYTES = 512 * 2**20
+RAW_CONF = 0.001  #confidence floor of the stored detections
+
+_WEIGHTS_HASHES = {}
+
+
+def file_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def weights_digest(path):
+    """SHA-256 of a weights file (or every file of an export folder), memoised per mtime."""
+    path = Path(path)
+    files = sorted(p for p in path.rglob('*') if p.is_file()) if path.is_dir() else [path]
+    stamp = tuple((str(p), p.stat().st_size, p.stat().st_mtime_ns) for p in files)
+    digest = _WEIGHTS_HASHES.get(stamp)
+    if digest is None:
+        h = hashlib.sha256()
+        for p in files:
+            h.update(p.relative_to(path).as_posix().encode() if path.is_dir() else b'')
+            with open(p, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    h.update(block)
+        digest = _WEIGHTS_HASHES[stamp] = h.hexdigest()
+    return digest
+
+
+class ResultCache:
+    """Size-bounded LRU store of ``(xyxy, conf, cls, names)`` per key."""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.dir, self.max_bytes = Path(cache_dir), max_bytes
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._size = sum(p.stat().st_size for p in self.dir.glob('*/*.npz'))
+
+    @staticmethod
+    def key(image_digest, weights_hash, **params):
+        blob = json.dumps({'image': image_digest, 'weights': weights_hash, **params}, sort_keys=True)
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def _path(self, key):
+        return self.dir / key[:2] / f'{key}.npz'
+
+    def get(self, key):
+        """Return the cached ``(xyxy, conf, cls, names)`` or None."""
+        p = self._path(key)
+        try:
+            with np.load(p) as z:
+                entry = (z['xyxy'], z['conf'], z['cls'],
+                         {int(k): v for k, v in json.loads(str(z['names'])).items()})
+            os.utime(p)  #mark as recently used
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+            #truncated or corrupt entry (e.g. an interrupted run) – drop it and recompute
+            self._discard(p)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, key, xyxy, conf, cls, names):
+        buf = io.BytesIO()
+        np.savez(buf, xyxy=np.asarray(xyxy, np.float32), conf=np.asarray(conf, np.float32),
+                 cls=np.asarray(cls, np.int16), names=np.array(json.dumps(names)))
+        p = self._path(key)
+        p.parent.mkdir(exist_ok=True)
+        tmp = p.with_suffix(f'.{threading.get_ident()}.tmp')
+        try:
+            tmp.write_bytes(buf.getbuffer())
+            tmp.replace(p)
+        finally:
+            tmp.unlink(missing_ok=True)
+        with self._lock:
+            self._size += buf.getbuffer().nbytes
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _discard(self, p):
+        try:
+            size = p.stat().st_size
+            p.unlink()
+        except OSError:
+            return
+        with self._lock:
+            self._size -= size
+
+    def _evict(self):
+        # drop least recently used entries until 10 % below the limit
+        entries = sorted(((p.stat().st_mtime_ns, p.stat().st_size, p)
+                          for p in self.dir.glob('*/*.npz')), key=lambda e: e[0])
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, p in entries:
+            if self._size <= self.max_bytes * 0.9:
+                break
+            p.unlink(missing_ok=True)
+            self._size -= size
+
+
+def apply_threshold(xyxy, conf, cls, threshold):
+    """Keep detections with confidence ≥ *threshold*."""
+    keep = conf >= threshold
+    return xyxy[keep], conf[keep], cls[keep]
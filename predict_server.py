@@ -0,0 +1,213 @@
+"""
+Persistent local YOLO inference server with dynamic batching.
+
+``yolo_predict.py`` reloads and warms up the weights on every run.  This
+server loads them once, warms them up and answers ``POST /predict``
+(request body = encoded image bytes) on localhost.  Concurrent requests
+are grouped into micro-batches of at most ``--max-batch`` images, waiting
+no longer than ``--max-wait-ms`` for a batch to fill.  The response is
+the same detection list ``yolo_predict.py`` writes::
+
+    {"detections": [{"class": "pump_on", "confidence": 0.91, "xyxy": [...]}, ...]}
+
+``GET /stats`` returns request and batch-size counters.  The ``load``
+sub-command is a local load generator reporting p50/p99 latency and
+throughput::
+
+    python predict_server.py serve --weights runs/detect/train7/weights/best.pt
+    python predict_server.py load cropped_enhanced/ --concurrency 8 --requests 400
+"""
+
+import json
+import time
+import queue
+import argparse
+import threading
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ultralytics import YOLO
+import cv2
+import numpy as np
+
+import yolo_predict
+
+HOST, PORT = '127.0.0.1', 8765
+MAX_BATCH = 8
+MAX_WAIT_MS = 5.0
+TIMEOUT_S = 60.0  #a request waiting longer than this for its batch gets a 504
+
+
+class MicroBatcher:
+    """Collects submitted images into batches for one model on one thread."""
+
+    def __init__(self, model, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS,
+                 imgsz=yolo_predict.IMGSZ, conf=0.25, iou=0.7):
+        self.model, self.max_batch, self.max_wait = model, max_batch, max_wait_ms / 1000
+        self.imgsz, self.conf, self.iou = imgsz, conf, iou
+        self.stats = {'requests': 0, 'batches': 0, 'batch_sizes': {}}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def warmup(self, runs=2):
+        dummy = np.zeros((self.imgsz, self.imgsz, 3), np.uint8)
+        for _ in range(runs):
+            self.model.predict(source=[dummy] * self.max_batch, imgsz=self.imgsz,
+                               batch=self.max_batch, save=False, verbose=False)
+
+    def submit(self, image):
+        """Queue a BGR image; the returned future resolves to its detections."""
+        fut = Future()
+        self._queue.put((image, fut))
+        return fut
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            images = [im for im, _ in batch]
+            try:
+                results = self.model.predict(source=images, imgsz=self.imgsz, conf=self.conf,
+                                             iou=self.iou, batch=len(images), save=False,
+                                             verbose=False)
+                #convert every result before resolving any future, so an error fails the whole batch
+                responses = [yolo_predict.detections(r) for r in results]
+                if len(responses) != len(batch):
+                    raise RuntimeError(f"{len(responses)} results for a batch of {len(batch)}")
+                for (_, fut), response in zip(batch, responses):
+                    fut.set_result(response)
+            except Exception as exc:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(exc)
+            with self._lock:
+                n = len(batch)
+                self.stats['requests'] += n
+                self.stats['batches'] += 1
+                self.stats['batch_sizes'][n] = self.stats['batch_sizes'].get(n, 0) + 1
+
+
+def make_handler(batcher, timeout=TIMEOUT_S):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, code, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                with batcher._lock:
+                    self._reply(200, batcher.stats)
+            elif self.path == '/health':
+                self._reply(200, {'ok': True})
+            else:
+                self._reply(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                self._reply(404, {'error': 'not found'})
+                return
+            data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                self._reply(400, {'error': 'could not decode image'})
+                return
+            try:
+                self._reply(200, {'detections': batcher.submit(image).result(timeout)})
+            except TimeoutError:
+                self._reply(504, {'error': f'no result within {timeout} s'})
+            except Exception as exc:
+                self._reply(500, {'error': str(exc)})
+
+        def log_message(self, *args):
+            pass  #one line per request would dominate the console under load
+
+    return Handler
+
+
+def serve(args):
+    model = YOLO(args.weights)
+    batcher = MicroBatcher(model, args.max_batch, args.max_wait_ms, args.imgsz, args.conf, args.iou)
+    print("Warming up …")
+    batcher.warmup()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(batcher, args.timeout))
+    print(f"✅ Serving {args.weights} on http://{args.host}:{args.port}/predict "
+          f"(max batch {args.max_batch}, max wait {args.max_wait_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def load_test(args):
+    """Send ``--requests`` images from ``--concurrency`` threads; report latency."""
+    paths = yolo_predict.iter_image_paths(args.sources)
+    if not paths:
+        raise SystemExit(f"No images found in {', '.join(args.sources)}")
+    payloads = [p.read_bytes() for p in paths]
+    url = f'http://{args.host}:{args.port}/predict'
+
+    def one(i):
+        req = urllib.request.Request(url, data=payloads[i % len(payloads)], method='POST')
+        t = time.perf_counter()
+        with urllib.request.urlopen(req) as resp:
+            resp.read()
+        return time.perf_counter() - t
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        latencies = np.array(list(pool.map(one, range(args.requests)))) * 1000
+    wall = time.perf_counter() - t0
+    print(f"{args.requests} requests, concurrency {args.concurrency}: "
+          f"{args.requests / wall:.1f} req/s, p50 {np.percentile(latencies, 50):.1f} ms, "
+          f"p99 {np.percentile(latencies, 99):.1f} ms, max {latencies.max():.1f} ms")
+    with urllib.request.urlopen(f'http://{args.host}:{args.port}/stats') as resp:
+        print("server:", resp.read().decode())
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Local YOLO inference server with dynamic batching.")
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    s = sub.add_parser('serve')
+    s.add_argument('--weights', default=yolo_predict.WEIGHTS)
+    s.add_argument('--imgsz', type=int, default=yolo_predict.IMGSZ)
+    s.add_argument('--conf', type=float, default=0.25)
+    s.add_argument('--iou', type=float, default=0.7)
+    s.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    s.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS)
+    s.add_argument('--timeout', type=float, default=TIMEOUT_S, help="seconds a request may wait for its result")
+    l = sub.add_parser('load')
+    l.add_argument('sources', nargs='+', help="images, folders or glob patterns to send")
+    l.add_argument('--concurrency', type=int, default=8)
+    l.add_argument('--requests', type=int, default=200)
+    for p in (s, l):
+        p.add_argument('--host', default=HOST)
+        p.add_argument('--port', type=int, default=PORT)
+    args = ap.parse_args(argv)
+    if args.cmd == 'serve':
+        serve(args)
+    else:
+        load_test(args)
+
+
+if __name__ == '__main__':
+    main()
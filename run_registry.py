@@ -0,0 +1,305 @@
+"""
+Indexed registry of the training and tuning runs under ``runs/detect``.
+
+Every run folder is parsed into a local SQLite database: ``args.yaml`` into
+an ``args`` table (one row per key), ``results.csv`` into an ``epochs``
+table (one row per epoch) and ``tune_results.csv`` into ``trials``.  A
+summary row per run (optimizer, model, best mAP50-95 and its epoch, …)
+makes the common questions plain indexed queries.  Indexing is
+incremental: a folder is re-read only when the size or mtime of one of
+its files changed, and folders that disappeared are dropped.  Every query
+re-indexes first (a ``stat`` per file), unless ``--no-index`` is given::
+
+    python run_registry.py best --by optimizer
+    python run_registry.py runs --where optimizer=AdamW --top 5
+    python run_registry.py curve train10 train14 --metric map50_95 --every 25
+    python run_registry.py diff train10 train14
+"""
+
+import csv
+import json
+import math
+import sqlite3
+import argparse
+from pathlib import Path
+
+import yaml
+
+RUNS_DIR = Path('runs/detect')
+DB_PATH = Path('.run_registry.sqlite')
+RUN_FILES = ('args.yaml', 'results.csv', 'tune_results.csv')
+
+# results.csv column → epochs table column
+EPOCH_COLUMNS = {
+    'epoch': 'epoch',
+    'time': 'time',
+    'train/box_loss': 'train_box',
+    'train/cls_loss': 'train_cls',
+    'train/dfl_loss': 'train_dfl',
+    'metrics/precision(B)': 'precision',
+    'metrics/recall(B)': 'recall',
+    'metrics/mAP50(B)': 'map50',
+    'metrics/mAP50-95(B)': 'map50_95',
+    'val/box_loss': 'val_box',
+    'val/cls_loss': 'val_cls',
+    'val/dfl_loss': 'val_dfl',
+}
+METRICS = [c for c in EPOCH_COLUMNS.values() if c != 'epoch']
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS files (
+    run TEXT, name TEXT, size INTEGER, mtime_ns INTEGER, PRIMARY KEY (run, name));
+CREATE TABLE IF NOT EXISTS runs (
+    run TEXT PRIMARY KEY, path TEXT, kind TEXT, model TEXT, data TEXT, optimizer TEXT,
+    imgsz INTEGER, batch INTEGER, epochs_planned INTEGER, epochs_done INTEGER,
+    best_map50_95 REAL, best_map50 REAL, best_epoch INTEGER, final_map50_95 REAL,
+    trials INTEGER, best_fitness REAL);
+CREATE TABLE IF NOT EXISTS args (
+    run TEXT, key TEXT, value TEXT, PRIMARY KEY (run, key));
+CREATE TABLE IF NOT EXISTS epochs (
+    run TEXT, {', '.join(f'{c} REAL' for c in EPOCH_COLUMNS.values())}, PRIMARY KEY (run, epoch));
+CREATE TABLE IF NOT EXISTS trials (
+    run TEXT, trial INTEGER, fitness REAL, hyp TEXT, PRIMARY KEY (run, trial));
+CREATE INDEX IF NOT EXISTS runs_optimizer ON runs (optimizer, best_map50_95);
+CREATE INDEX IF NOT EXISTS runs_best ON runs (best_map50_95);
+CREATE INDEX IF NOT EXISTS args_key ON args (key, value);
+"""
+
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+
+def _number(v):
+    try:
+        x = float(v)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(x) else x
+
+
+def read_results(path):
+    """``results.csv`` rows as dicts keyed by the ``epochs`` columns (headers may be padded)."""
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    return [{EPOCH_COLUMNS[k.strip()]: _number(v) for k, v in r.items()
+             if k and k.strip() in EPOCH_COLUMNS} for r in rows]
+
+
+def _canon(value):
+    """JSON text of an arg value; integral floats as ints so ``10`` and ``10.0`` compare equal."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return json.dumps(value)
+
+
+def read_args(path):
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+
+def read_trials(path):
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    return [(i, _number(r.pop('fitness', None)), json.dumps({k: _number(v) for k, v in r.items()}))
+            for i, r in enumerate(rows)]
+
+
+def _best(epochs, key):
+    scored = [e for e in epochs if e.get(key) is not None and not math.isinf(e[key])]
+    return max(scored, key=lambda e: e[key]) if scored else None
+
+
+def index_run(db, run, folder):
+    """(Re-)insert every row of one run folder."""
+    for table in ('runs', 'args', 'epochs', 'trials'):
+        db.execute(f'DELETE FROM {table} WHERE run = ?', (run,))
+    args = read_args(folder / 'args.yaml') if (folder / 'args.yaml').exists() else {}
+    epochs = read_results(folder / 'results.csv') if (folder / 'results.csv').exists() else []
+    trials = read_trials(folder / 'tune_results.csv') if (folder / 'tune_results.csv').exists() else []
+
+    db.executemany('INSERT INTO args VALUES (?, ?, ?)',
+                   [(run, k, _canon(v)) for k, v in args.items()])
+    cols = list(EPOCH_COLUMNS.values())
+    db.executemany(f'INSERT OR REPLACE INTO epochs VALUES (?, {", ".join("?" * len(cols))})',
+                   [(run, *(e.get(c) for c in cols)) for e in epochs if e.get('epoch') is not None])
+    db.executemany('INSERT INTO trials VALUES (?, ?, ?, ?)', [(run, *t) for t in trials])
+
+    best = _best(epochs, 'map50_95')
+    fitness = [t[1] for t in trials if t[1] is not None]
+    db.execute('INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+        run, str(folder), 'tune' if trials else 'train',
+        args.get('model'), args.get('data'), args.get('optimizer'),
+        args.get('imgsz'), args.get('batch'), args.get('epochs'),
+        len(epochs) or None,
+        best and best['map50_95'], best and best['map50'], best and int(best['epoch']),
+        epochs[-1].get('map50_95') if epochs else None,
+        len(trials) or None, max(fitness) if fitness else None))
+
+
+def update_index(db, root=RUNS_DIR):
+    """Re-index changed run folders; returns ``(changed, removed)`` counts."""
+    known = {}
+    for run, name, size, mtime in db.execute('SELECT run, name, size, mtime_ns FROM files'):
+        known.setdefault(run, {})[name] = (size, mtime)
+    seen, changed = set(), 0
+    for folder in sorted(p for p in Path(root).iterdir() if p.is_dir()):
+        stamps = {}
+        for name in RUN_FILES:
+            try:
+                st = (folder / name).stat()
+            except FileNotFoundError:
+                continue
+            stamps[name] = (st.st_size, st.st_mtime_ns)
+        if not stamps:
+            continue
+        run = folder.name
+        seen.add(run)
+        if known.get(run) == stamps:
+            continue
+        with db:
+            index_run(db, run, folder)
+            db.execute('DELETE FROM files WHERE run = ?', (run,))
+            db.executemany('INSERT INTO files VALUES (?, ?, ?, ?)',
+                           [(run, name, *st) for name, st in stamps.items()])
+        changed += 1
+    removed = set(known) - seen
+    with db:
+        for run in removed:
+            for table in ('files', 'runs', 'args', 'epochs', 'trials'):
+                db.execute(f'DELETE FROM {table} WHERE run = ?', (run,))
+    return changed, len(removed)
+
+
+def connect(path=DB_PATH):
+    db = sqlite3.connect(str(path))
+    db.executescript(SCHEMA)
+    return db
+
+
+# ---------------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------------
+
+def _table(header, rows):
+    rows = [['' if v is None else f'{v:.4f}' if isinstance(v, float) else str(v) for v in r]
+            for r in rows]
+    widths = [max(len(str(h)), *(len(r[i]) for r in rows)) if rows else len(str(h))
+              for i, h in enumerate(header)]
+    print('  '.join(str(h).ljust(w) for h, w in zip(header, widths)))
+    for r in rows:
+        print('  '.join(v.ljust(w) for v, w in zip(r, widths)))
+
+
+def _where(filters):
+    """``key=value`` filters on ``args`` as SQL; values are compared as YAML scalars."""
+    sql, params = [], []
+    for f in filters:
+        key, _, value = f.partition('=')
+        sql.append('EXISTS (SELECT 1 FROM args a WHERE a.run = r.run AND a.key = ? AND a.value = ?)')
+        params += [key, _canon(yaml.safe_load(value))]
+    return (' AND ' + ' AND '.join(sql)) if sql else '', params
+
+
+def query_best(db, by='optimizer', metric='best_map50_95', top=1, filters=()):
+    """The *top* runs per value of the arg *by*, ranked by *metric*."""
+    where, params = _where(filters)
+    rows = db.execute(f"""
+        SELECT grp, run, {metric}, best_epoch, epochs_done FROM (
+            SELECT a.value AS grp, r.*, ROW_NUMBER() OVER (
+                PARTITION BY a.value ORDER BY r.{metric} DESC) AS rank
+            FROM runs r JOIN args a ON a.run = r.run AND a.key = ?
+            WHERE r.{metric} IS NOT NULL{where})
+        WHERE rank <= ? ORDER BY {metric} DESC""", [by, *params, top]).fetchall()
+    _table([by, 'run', metric, 'best_epoch', 'epochs'],
+           [(json.loads(g), *rest) for g, *rest in rows])
+
+
+def query_runs(db, metric='best_map50_95', top=20, filters=()):
+    where, params = _where(filters)
+    rows = db.execute(f"""
+        SELECT run, kind, model, optimizer, imgsz, batch, epochs_done, best_map50, best_map50_95,
+               best_epoch, best_fitness
+        FROM runs r WHERE 1 = 1{where}
+        ORDER BY {metric} IS NULL, {metric} DESC LIMIT ?""", [*params, top]).fetchall()
+    _table(['run', 'kind', 'model', 'optimizer', 'imgsz', 'batch', 'epochs', 'mAP50', 'mAP50-95',
+            'best_epoch', 'fitness'], rows)
+
+
+def query_curve(db, runs, metric='map50_95', every=1, out=None):
+    """One row per epoch, one column per run."""
+    data = {}
+    for run, epoch, value in db.execute(
+            f"SELECT run, epoch, {metric} FROM epochs WHERE run IN ({', '.join('?' * len(runs))})"
+            f" ORDER BY epoch", runs):
+        data.setdefault(int(epoch), {})[run] = value
+    epochs = [e for e in sorted(data) if e % every == 0 or e == 1 or e == max(data)]
+    rows = [(e, *(data[e].get(r) for r in runs)) for e in epochs]
+    if out:
+        with open(out, 'w', newline='') as f:
+            w = csv.writer(f)
+            w.writerow(['epoch', *runs])
+            w.writerows((e, *(data[e].get(r) for r in runs)) for e in sorted(data))
+        print(f"✅ Curve saved to {out}")
+    _table(['epoch', *runs], rows)
+
+
+def query_diff(db, a, b, all_keys=False):
+    args = {run: dict(db.execute('SELECT key, value FROM args WHERE run = ?', (run,)))
+            for run in (a, b)}
+    for run in (a, b):
+        if not args[run]:
+            raise SystemExit(f"No args.yaml indexed for {run}")
+    keys = sorted(set(args[a]) | set(args[b]))
+    rows = [(k, *(json.loads(args[run][k]) if k in args[run] else '—' for run in (a, b))) for k in keys
+            if all_keys or args[a].get(k) != args[b].get(k)]
+    _table(['arg', a, b], rows)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Query the indexed training runs.")
+    ap.add_argument('--runs-dir', type=Path, default=RUNS_DIR)
+    ap.add_argument('--db', type=Path, default=DB_PATH)
+    ap.add_argument('--no-index', action='store_true', help="query without re-indexing first")
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('index', help="update the index only")
+    b = sub.add_parser('best', help="best runs per value of an arg")
+    b.add_argument('--by', default='optimizer')
+    b.add_argument('--metric', default='best_map50_95', choices=['best_map50_95', 'best_map50',
+                                                                 'final_map50_95', 'best_fitness'])
+    b.add_argument('--top', type=int, default=1)
+    b.add_argument('--where', nargs='*', default=[], help="arg filters, e.g. imgsz=1280")
+    r = sub.add_parser('runs', help="list runs ranked by a metric")
+    r.add_argument('--metric', default='best_map50_95', choices=['best_map50_95', 'best_map50',
+                                                                 'final_map50_95', 'best_fitness'])
+    r.add_argument('--top', type=int, default=20)
+    r.add_argument('--where', nargs='*', default=[])
+    c = sub.add_parser('curve', help="per-epoch metric of several runs")
+    c.add_argument('runs', nargs='+')
+    c.add_argument('--metric', default='map50_95', choices=METRICS)
+    c.add_argument('--every', type=int, default=1, help="print every N-th epoch")
+    c.add_argument('--out', default=None, help="also save the full curve as CSV")
+    d = sub.add_parser('diff', help="args that differ between two runs")
+    d.add_argument('a')
+    d.add_argument('b')
+    d.add_argument('--all', action='store_true', help="show equal args too")
+    args = ap.parse_args(argv)
+
+    db = connect(args.db)
+    if not args.no_index or args.cmd == 'index':
+        changed, removed = update_index(db, args.runs_dir)
+        if changed or removed or args.cmd == 'index':
+            print(f"Indexed {changed} changed run(s), dropped {removed}")
+    if args.cmd == 'best':
+        query_best(db, args.by, args.metric, args.top, args.where)
+    elif args.cmd == 'runs':
+        query_runs(db, args.metric, args.top, args.where)
+    elif args.cmd == 'curve':
+        query_curve(db, args.runs, args.metric, args.every, args.out)
+    elif args.cmd == 'diff':
+        query_diff(db, args.a, args.b, args.all)
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
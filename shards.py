@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Sharded container format for synthetic samples.
+
+Writing one ``.jpg`` and one ``.txt`` per sample produces hundreds of
+thousands of tiny files at training scale.  A shard instead stores a fixed
+number of samples as two files::
+
+    shard_00000.bin   encoded images, concatenated in sample order
+    shard_00000.npz   index: offsets (n+1), sample indices (n),
+                      labels (m, 5) float32 and label_offsets (n+1)
+
+Labels are YOLO rows ``class cx cy w h`` (normalised), packed for the whole
+shard into one array.  :class:`ShardReader` maps the blobs read-only and
+supports random access (``reader[i]``) and sequential streaming
+(``iter(reader)``).
+
+``python shards.py synthetic_shards`` prints a summary of a shard folder.
+"""
+
+import io
+import random
+import argparse
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+SHARD_PATTERN = "shard_{:05d}"
+
+# ---------------------------------------------------------------------------
+# 1. Writer
+# ---------------------------------------------------------------------------
+
+class ShardWriter:
+    """Write one shard of ``size`` samples starting at sample ``first``.
+
+    :meth:`add` is thread-safe and may be called in any order; samples are
+    appended to the blob in index order (out-of-order arrivals wait in
+    memory), so the shard bytes do not depend on writer-thread timing.
+    """
+
+    def __init__(self, root, shard_id, first, size, ext=".jpg"):
+        self.root, self.first, self.size, self.ext = Path(root), first, size, ext
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.stem = self.root / SHARD_PATTERN.format(shard_id)
+        self._tmp = self.stem.with_suffix(".bin.tmp")
+        self._blob = open(self._tmp, "wb")
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._next = first
+        self._offsets, self._labels = [0], []
+
+    def add(self, index, data, lbl):
+        """Add sample *index* (encoded bytes *data*, label rows *lbl*)."""
+        with self._lock:
+            self._pending[index] = (data, lbl)
+            while self._next in self._pending:
+                data, lbl = self._pending.pop(self._next)
+                self._blob.write(data)
+                self._offsets.append(self._offsets[-1] + len(data))
+                self._labels.append(np.asarray(lbl, np.float32).reshape(-1, 5))
+                self._next += 1
+
+    def close(self):
+        """Finish the shard; returns the number of samples written."""
+        with self._lock:
+            if self._pending:
+                raise RuntimeError(f"{self.stem.name}: samples missing before "
+                                   f"{min(self._pending)} (next expected {self._next})")
+            self._blob.close()
+            n = len(self._offsets) - 1
+            counts = [len(lb) for lb in self._labels]
+            tmp_index = self.stem.with_suffix(".npz.tmp")
+            with open(tmp_index, "wb") as f:
+                np.savez(f, offsets=np.asarray(self._offsets, np.int64),
+                         indices=np.arange(self.first, self.first + n, dtype=np.int64),
+                         labels=(np.concatenate(self._labels) if self._labels
+                                 else np.empty((0, 5), np.float32)),
+                         label_offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+                         ext=np.array(self.ext))
+            # the index is renamed last: a shard is visible only when complete
+            self._tmp.replace(self.stem.with_suffix(".bin"))
+            tmp_index.replace(self.stem.with_suffix(".npz"))
+            return n
+
+# ---------------------------------------------------------------------------
+# 2. Reader
+# ---------------------------------------------------------------------------
+
+def decode_image(data, ext):
+    """Decode bytes written by ``lableing.encode_image``."""
+    if ext == ".npy":
+        return np.load(io.BytesIO(data), allow_pickle=False)
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+class ShardReader:
+    """Random-access and streaming reader over a folder of shards.
+
+    ``reader[i]`` returns ``(image, labels)`` for the *i*-th stored sample
+    (shards in name order, samples in index order); ``labels`` is a
+    ``(n, 5)`` float32 array.  :meth:`raw` returns the undecoded bytes.
+    Blobs are memory-mapped lazily, so opening a reader only reads the
+    small ``.npz`` indexes.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.paths = sorted(self.root.glob("shard_*.npz"))
+        self.index = []
+        for p in self.paths:
+            with np.load(p) as z:
+                self.index.append({k: z[k] for k in z.files})
+        counts = [len(ix["indices"]) for ix in self.index]
+        self.starts = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self._blobs = [None] * len(self.paths)
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def _locate(self, i):
+        if not -len(self) <= i < len(self):
+            raise IndexError(i)
+        i %= len(self)
+        s = int(np.searchsorted(self.starts, i, side="right")) - 1
+        return s, i - int(self.starts[s])
+
+    def _blob(self, s):
+        if self._blobs[s] is None:
+            self._blobs[s] = np.memmap(self.paths[s].with_suffix(".bin"), np.uint8, "r")
+        return self._blobs[s]
+
+    def _entry(self, s, j):
+        ix = self.index[s]
+        o = ix["offsets"]
+        lo = ix["label_offsets"]
+        data = self._blob(s)[o[j]:o[j + 1]]
+        return int(ix["indices"][j]), data, str(ix["ext"]), ix["labels"][lo[j]:lo[j + 1]]
+
+    def raw(self, i):
+        """Return ``(sample_index, bytes, ext, labels)`` without decoding."""
+        return self._entry(*self._locate(i))
+
+    def sample_index(self, i):
+        s, j = self._locate(i)
+        return int(self.index[s]["indices"][j])
+
+    def labels(self, i):
+        return self.raw(i)[3]
+
+    def all_labels(self):
+        """All label rows of every shard as one ``(m, 5)`` array."""
+        return np.concatenate([ix["labels"] for ix in self.index]) if self.index \
+            else np.empty((0, 5), np.float32)
+
+    def __getitem__(self, i):
+        _, data, ext, lbl = self.raw(i)
+        return decode_image(data, ext), lbl
+
+    def __iter__(self):
+        return self.stream()
+
+    def stream(self, shuffle=False, seed=None):
+        """Yield ``(image, labels)`` reading each blob front to back.
+
+        With *shuffle* the shard order and the order inside each shard are
+        permuted, which keeps reads local to one blob at a time.
+        """
+        rng = random.Random(seed)
+        order = list(range(len(self.paths)))
+        if shuffle:
+            rng.shuffle(order)
+        for s in order:
+            inner = list(range(len(self.index[s]["indices"])))
+            if shuffle:
+                rng.shuffle(inner)
+            for j in inner:
+                _, data, ext, lbl = self._entry(s, j)
+                yield decode_image(data, ext), lbl
+
+# ---------------------------------------------------------------------------
+# 3. Main entry point
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Summarise a folder of synthetic shards.")
+    ap.add_argument("root", type=Path)
+    args = ap.parse_args(argv)
+    reader = ShardReader(args.root)
+    size = sum(p.with_suffix(".bin").stat().st_size for p in reader.paths)
+    print(f"{len(reader.paths)} shards, {len(reader)} samples, "
+          f"{len(reader.all_labels())} boxes, {size / 2**20:.1f} MiB")
+
+if __name__ == "__main__":
+    main()
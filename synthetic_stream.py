@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Stream synthetic samples straight into ultralytics training.
+
+Instead of writing JPEGs with ``lableing.py`` and decoding them again in
+the dataloader, :class:`SyntheticYOLODataset` calls
+``lableing.SyntheticGenerator`` for every sample it is asked for.  No image
+is encoded, written or decoded, and with ``--fresh`` every draw is a new
+layout, so each epoch sees different data without any storage growth.
+
+Only the *train* split is synthetic; validation still runs on the images
+listed under ``val:`` in ``dataset.yaml``::
+
+    python synthetic_stream.py --epochs 50 --num-images 20000 --fresh
+"""
+
+import math
+import random
+import argparse
+import multiprocessing
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.utils.plotting import plot_labels
+
+import lableing
+import train_cache
+
+PLOT_LABELS = 1000  # layouts sampled for the training label plots
+
+# ---------------------------------------------------------------------------
+# 1. Plain generator (framework independent)
+# ---------------------------------------------------------------------------
+
+def iter_samples(gen=None, num_images=None, base_seed=lableing.BASE_SEED, fresh=False):
+    """Yield ``(canvas, labels)`` forever, or ``num_images`` times.
+
+    Deterministic by default: sample *i* is exactly what ``lableing.py``
+    writes as ``synthetic_{i:04d}``.  With *fresh* every sample gets an
+    unseeded RNG.
+    """
+    gen = gen or lableing.default_generator()
+    i = 0
+    while num_images is None or i < num_images:
+        rng = random.Random() if fresh else random.Random(lableing.image_seed(base_seed, i))
+        yield gen.generate(rng)
+        i += 1
+
+# ---------------------------------------------------------------------------
+# 2. ultralytics dataset / trainer
+# ---------------------------------------------------------------------------
+
+class LazyLabels:
+    """Sequence of label dicts, each laid out (placement only) on first access.
+
+    Deterministic layouts are cached; with *fresh* nothing is cached and
+    every access lays out a new random sample.
+    """
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self._cache = {}
+
+    def __len__(self):
+        return self.dataset.num_images
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        label = self._cache.get(index)
+        if label is None:
+            ds = self.dataset
+            label = ds._label_dict(index, ds.generator.layout(ds._rng(index))[1])
+            if not ds.fresh:
+                self._cache[index] = label
+        return label
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+class SyntheticYOLODataset(YOLODataset):
+    """YOLODataset whose images are composed on demand instead of read from disk.
+
+    ``self.labels`` is a :class:`LazyLabels`, so start-up costs nothing per
+    sample and ultralytics' label statistics and plots still work;
+    :meth:`get_image_and_label` always returns an image and the labels
+    generated together with it.  ``classes`` and ``single_cls`` are applied
+    to every label as it is generated.
+    """
+
+    def __init__(self, *args, generator=None, num_images=lableing.NUM_IMAGES,
+                 base_seed=lableing.BASE_SEED, fresh=False, **kwargs):
+        self.generator = generator or lableing.default_generator()
+        self.num_images, self.base_seed, self.fresh = num_images, base_seed, fresh
+        self.include_class = None
+        super().__init__(*args, **kwargs)
+
+    def _rng(self, index):
+        if self.fresh:
+            return random.Random()
+        return random.Random(lableing.image_seed(self.base_seed, index))
+
+    def _label_dict(self, index, lbl):
+        arr = np.asarray(lbl, np.float32).reshape(-1, 5)
+        if self.include_class is not None:
+            arr = arr[np.isin(arr[:, 0], self.include_class)]
+        if self.single_cls:
+            arr[:, 0] = 0
+        return {
+            "im_file": self.im_files[index],
+            "shape": (self.generator.img_h, self.generator.img_w),
+            "cls": arr[:, :1],
+            "bboxes": arr[:, 1:],
+            "segments": [],
+            "keypoints": None,
+            "normalized": True,
+            "bbox_format": "xywh",
+        }
+
+    def get_img_files(self, img_path):
+        # virtual names – only used for logging and plots
+        return [f"synthetic_stream/synthetic_{i:06d}.jpg" for i in range(self.num_images)]
+
+    def get_labels(self):
+        return LazyLabels(self)
+
+    def update_labels(self, include_class):
+        # the default filters every label now, i.e. would lay out the whole epoch
+        self.include_class = include_class
+
+    def get_image_and_label(self, index):
+        im, lbl = self.generator.generate(self._rng(index))
+        label = self._label_dict(index, lbl)
+        label.pop("shape")
+        h0, w0 = im.shape[:2]
+        r = self.imgsz / max(h0, w0)  # long side to imgsz, as BaseDataset.load_image
+        if r != 1:
+            w, h = min(math.ceil(w0 * r), self.imgsz), min(math.ceil(h0 * r), self.imgsz)
+            im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+        label["img"], label["ori_shape"], label["resized_shape"] = im, (h0, w0), im.shape[:2]
+        label["ratio_pad"] = (im.shape[0] / h0, im.shape[1] / w0)
+        train_cache.push_buffer(self, index)
+        return self.update_labels_info(label)
+
+class SyntheticTrainer(train_cache.TrainSplitTrainer):
+    """DetectionTrainer that streams the train split from the generator."""
+
+    dataset_class = SyntheticYOLODataset
+    prefix = "synthetic: "
+
+    def plot_training_labels(self):
+        # the default plots every label, i.e. would lay out the whole epoch
+        labels = self.train_loader.dataset.labels[:PLOT_LABELS]
+        boxes = np.concatenate([lb["bboxes"] for lb in labels], 0)
+        cls = np.concatenate([lb["cls"] for lb in labels], 0)
+        plot_labels(boxes, cls.squeeze(), names=self.data["names"], save_dir=self.save_dir,
+                    on_plot=self.on_plot)
+
+def make_trainer(**stream_kwargs):
+    """:class:`SyntheticTrainer` bound to *stream_kwargs*, e.g. ``make_trainer(fresh=True)``."""
+    return train_cache.make_trainer(SyntheticTrainer, **stream_kwargs)
+
+# ---------------------------------------------------------------------------
+# 3. Main entry point
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Train YOLO on synthetic samples generated on the fly.")
+    ap.add_argument("--model", default="yolov8.yaml")
+    ap.add_argument("--weights", default="yolov8n.pt")
+    ap.add_argument("--data", default="dataset.yaml")
+    ap.add_argument("--epochs", type=int, default=100)
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--batch", type=int, default=16)
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("-n", "--num-images", type=int, default=lableing.NUM_IMAGES,
+                    help="samples per epoch")
+    ap.add_argument("--seed", type=int, default=lableing.BASE_SEED)
+    ap.add_argument("--fresh", action="store_true", help="new random layout on every draw")
+    args = ap.parse_args(argv)
+
+    model = YOLO(args.model).load(args.weights)
+    trainer = make_trainer(num_images=args.num_images, base_seed=args.seed, fresh=args.fresh)
+    model.train(data=args.data, trainer=trainer, epochs=args.epochs, imgsz=args.imgsz,
+                batch=args.batch, workers=args.workers)
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Pre-decoded, letterboxed training cache in one memory-mapped array.
+
+With ``cache: false`` every epoch decodes the 1700×800 JPEGs again and
+resizes them to ``imgsz``, so the CPU dataloader is the bottleneck.
+``build_cache`` does that work once: every image of the sources is
+decoded, letterboxed to ``imgsz``×``imgsz`` (grey 114 padding, as
+ultralytics) and stored in ``images.npy``::
+
+    .train_cache/640/images.npy   (n, 640, 640, 3) uint8
+    .train_cache/640/index.npz    labels (m, 5) in letterboxed coordinates,
+                                  label_offsets (n+1), files, original shapes
+    .train_cache/640/manifest.json  sources, imgsz and file stamps
+
+:class:`CachedYOLODataset` serves images as read-only views into the
+memory map.  Dataloader workers therefore share the page cache instead of
+each holding a copy, and nothing is decoded or resized per sample.  The
+cache is rebuilt only when a source file or ``imgsz`` changes::
+
+    python train_cache.py build --imgsz 640
+    python train_cache.py train --epochs 100 --workers 8
+"""
+
+import json
+import argparse
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+
+import lableing
+import shards
+
+CACHE_ROOT = Path(".train_cache")
+IMGSZ = 640
+PAD_VALUE = 114
+THREADS = 8
+# originals plus everything lableing.py can write (--codec webp/raw)
+IMAGE_SUFFIXES = lableing.IMAGE_SUFFIXES | lableing.CODEC_SUFFIXES
+# (image folder, label folder)
+SOURCES = [
+    (Path("dataset/images/train"), Path("dataset/labels/train")),
+    (lableing.OUT_IMG_DIR, lableing.OUT_LABEL_DIR),
+]
+
+# ---------------------------------------------------------------------------
+# 1. Build
+# ---------------------------------------------------------------------------
+
+def read_labels(path: Path):
+    """YOLO label rows of *path* as ``(n, 5)`` float32 (empty if there is no file)."""
+    try:
+        text = path.read_text()
+    except OSError:
+        text = ""
+    return np.array(text.split(), np.float32).reshape(-1, 5)
+
+def letterbox_into(out, img, pad_value=PAD_VALUE):
+    """Letterbox *img* into the square buffer *out*; return ``(ratio, (left, top))``."""
+    size = out.shape[0]
+    h, w = img.shape[:2]
+    r = min(size / h, size / w)
+    nh, nw = round(h * r), round(w * r)
+    top, left = (size - nh) // 2, (size - nw) // 2
+    out[...] = pad_value
+    out[top:top + nh, left:left + nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR) \
+        if (nh, nw) != (h, w) else img
+    return r, (left, top)
+
+def letterbox_labels(lbl, shape, ratio, pad, size):
+    """Map normalised ``class cx cy w h`` rows of an image of *shape* into the letterbox."""
+    h, w = shape
+    out = lbl.copy()
+    out[:, 1] = (lbl[:, 1] * w * ratio + pad[0]) / size
+    out[:, 2] = (lbl[:, 2] * h * ratio + pad[1]) / size
+    out[:, 3] = lbl[:, 3] * w * ratio / size
+    out[:, 4] = lbl[:, 4] * h * ratio / size
+    return out
+
+def source_files(sources):
+    """``[(image_path, label_path)]`` for every image of *sources*, sorted per folder."""
+    files = []
+    for img_dir, lbl_dir in sources:
+        img_dir = Path(img_dir)
+        if not img_dir.is_dir():
+            print(f"⚠️ {img_dir} does not exist – skipped")
+            continue
+        images = sorted(p for p in img_dir.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        if not images:
+            print(f"⚠️ No {'/'.join(sorted(IMAGE_SUFFIXES))} images in {img_dir} – skipped")
+        files += [(p, Path(lbl_dir) / f"{p.stem}.txt") for p in images]
+    return files
+
+def read_image(path: Path):
+    """BGR image of *path* (``.npy`` included), or ``None`` if it cannot be read."""
+    try:
+        return shards.decode_image(path.read_bytes(), path.suffix.lower())
+    except (OSError, ValueError):
+        return None
+
+def _stamp(p: Path):
+    try:
+        st = p.stat()
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+def fingerprint(files, imgsz):
+    return {"imgsz": imgsz,
+            "files": [[str(i), _stamp(i), str(l), _stamp(l)] for i, l in files]}
+
+def build_cache(sources=SOURCES, imgsz=IMGSZ, root=CACHE_ROOT, threads=THREADS, force=False):
+    """Build (or reuse) the cache for *sources* at *imgsz*; return its folder."""
+    out_dir = Path(root) / str(imgsz)
+    files = source_files(sources)
+    if not files:
+        raise FileNotFoundError(f"No images in {', '.join(str(s[0]) for s in sources)}")
+    fp = fingerprint(files, imgsz)
+    manifest = out_dir / "manifest.json"
+    if not force and manifest.exists() and json.loads(manifest.read_text()) == fp:
+        print(f"✅ Cache {out_dir} is up to date ({len(files)} images)")
+        return out_dir
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest.unlink(missing_ok=True)  # invalid until the build completes
+    tmp = out_dir / "images.npy.tmp"
+    images = np.lib.format.open_memmap(tmp, "w+", np.uint8, (len(files), imgsz, imgsz, 3))
+    shapes = np.zeros((len(files), 2), np.int32)
+    labels = [None] * len(files)
+    ok = np.zeros(len(files), bool)
+
+    def work(i):
+        img_path, lbl_path = files[i]
+        img = read_image(img_path)
+        if img is None:
+            print(f"⚠️ Could not read {img_path}")
+            labels[i] = np.empty((0, 5), np.float32)
+            return
+        ratio, pad = letterbox_into(images[i], img)
+        shapes[i] = img.shape[:2]
+        labels[i] = letterbox_labels(read_labels(lbl_path), img.shape[:2], ratio, pad, imgsz)
+        ok[i] = True
+
+    print(f"Decoding {len(files)} images to {imgsz}×{imgsz} …")
+    with ThreadPoolExecutor(threads) as pool:  # cv2 releases the GIL
+        list(pool.map(work, range(len(files))))
+    images.flush()
+    del images
+    tmp.replace(out_dir / "images.npy")
+    counts = [len(lb) for lb in labels]
+    with open(out_dir / "index.npz", "wb") as f:
+        np.savez(f, labels=np.concatenate(labels).astype(np.float32),
+                 label_offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+                 files=np.array([str(p) for p, _ in files]), shapes=shapes, valid=ok)
+    manifest.write_text(json.dumps(fp))
+    size = (out_dir / "images.npy").stat().st_size
+    print(f"✅ Cache written to {out_dir} ({ok.sum()} images, {sum(counts)} boxes, {size / 2**30:.2f} GiB)")
+    return out_dir
+
+# ---------------------------------------------------------------------------
+# 2. Reader
+# ---------------------------------------------------------------------------
+
+class TrainCache:
+    """Read-only access to a built cache; ``cache[i]`` is ``(image_view, labels)``.
+
+    The memory map is opened lazily in each process (and dropped when
+    pickled), so forked or spawned dataloader workers all map the same
+    file pages.  Images that could not be decoded are left out.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        with np.load(self.root / "index.npz") as z:
+            valid = z["valid"]
+            self.order = np.flatnonzero(valid)
+            self.files = [str(f) for f in z["files"][valid]]
+            self.shapes = z["shapes"][valid]
+            self._labels, self._offsets = z["labels"], z["label_offsets"]
+        self._images = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_images"] = None
+        return state
+
+    @property
+    def images(self):
+        if self._images is None:
+            self._images = np.load(self.root / "images.npy", mmap_mode="r")
+        return self._images
+
+    @property
+    def imgsz(self):
+        return self.images.shape[1]
+
+    def __len__(self):
+        return len(self.order)
+
+    def image(self, i):
+        return self.images[self.order[i]]
+
+    def labels(self, i):
+        j = self.order[i]
+        return self._labels[self._offsets[j]:self._offsets[j + 1]]
+
+    def __getitem__(self, i):
+        return self.image(i), self.labels(i)
+
+# ---------------------------------------------------------------------------
+# 3. ultralytics dataset / trainer
+# ---------------------------------------------------------------------------
+
+class CachedYOLODataset(YOLODataset):
+    """YOLODataset backed by a :class:`TrainCache` instead of image files.
+
+    :meth:`load_image` returns a read-only view into the memory map; every
+    ultralytics transform (mosaic, letterbox, perspective) writes into a
+    new array, so the view is never copied or modified.
+    """
+
+    def __init__(self, *args, cache_dir=None, **kwargs):
+        self.train_cache = TrainCache(cache_dir or CACHE_ROOT / str(IMGSZ))
+        super().__init__(*args, **kwargs)
+        if self.train_cache.imgsz != self.imgsz:
+            raise ValueError(f"cache {self.train_cache.root} is {self.train_cache.imgsz}px, "
+                             f"training at {self.imgsz}px – rebuild with --imgsz {self.imgsz}")
+
+    def get_img_files(self, img_path):
+        return list(self.train_cache.files)  # names only; pixels come from the memmap
+
+    def get_labels(self):
+        s = self.train_cache.imgsz
+        out = []
+        for i, f in enumerate(self.train_cache.files):
+            arr = self.train_cache.labels(i)
+            out.append({"im_file": f, "shape": (s, s), "cls": arr[:, :1].copy(),
+                        "bboxes": arr[:, 1:].copy(), "segments": [], "keypoints": None,
+                        "normalized": True, "bbox_format": "xywh"})
+        return out
+
+    def load_image(self, i, rect_mode=True):
+        im = self.train_cache.image(i)
+        push_buffer(self, i)
+        return im, im.shape[:2], im.shape[:2]
+
+def push_buffer(dataset, index):
+    """Record *index* in an augmenting dataset's buffer, as ``BaseDataset.load_image`` does."""
+    if dataset.augment:
+        # mosaic/mixup draw partner indices from this buffer
+        dataset.buffer.append(index)
+        if len(dataset.buffer) > max(dataset.max_buffer_length, 1):
+            dataset.buffer.pop(0)
+
+class TrainSplitTrainer(DetectionTrainer):
+    """DetectionTrainer whose train split is a ``dataset_class``; validation is unchanged.
+
+    Subclasses set ``dataset_class`` and ``prefix``; ``dataset_kwargs`` are
+    bound by :func:`make_trainer`.
+    """
+
+    dataset_class = None
+    dataset_kwargs = {}
+    prefix = "train: "
+
+    def build_dataset(self, img_path, mode="train", batch=None):
+        if mode != "train":
+            return super().build_dataset(img_path, mode, batch)
+        model = getattr(self.model, "module", self.model)
+        gs = max(int(model.stride.max()) if model else 0, 32)
+        cfg = self.args
+        return self.dataset_class(
+            img_path=img_path, imgsz=cfg.imgsz, batch_size=batch, augment=True,
+            hyp=cfg, rect=False, cache=False, single_cls=cfg.single_cls or False,
+            stride=gs, pad=0.0, prefix=self.prefix, classes=cfg.classes,
+            data=self.data, task=cfg.task, **self.dataset_kwargs)
+
+class CachedTrainer(TrainSplitTrainer):
+    """DetectionTrainer whose train split comes from a :class:`TrainCache`."""
+
+    dataset_class = CachedYOLODataset
+    prefix = "cached: "
+
+def make_trainer(trainer=CachedTrainer, **dataset_kwargs):
+    """Return a subclass of *trainer* bound to *dataset_kwargs* (e.g. ``cache_dir``).
+
+    ultralytics instantiates the trainer itself, so the dataset options are
+    attached to the class: ``model.train(trainer=make_trainer(cache_dir=...), ...)``.
+    """
+    return type(trainer.__name__, (trainer,), {"dataset_kwargs": dataset_kwargs})
+
+# ---------------------------------------------------------------------------
+# 4. Main entry point
+# ---------------------------------------------------------------------------
+
+def _source(arg):
+    img_dir, _, lbl_dir = arg.partition(":")
+    img_dir = Path(img_dir)
+    if not lbl_dir:  # YOLO convention: .../images/... → .../labels/...
+        parts = ["labels" if p == "images" else p for p in img_dir.parts]
+        lbl_dir = Path(*parts) if parts != list(img_dir.parts) else img_dir
+    return img_dir, Path(lbl_dir)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Letterboxed memmap cache for YOLO training.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="decode the sources into the cache")
+    t = sub.add_parser("train", help="build if needed, then train from the cache")
+    for p in (b, t):
+        p.add_argument("--source", action="append", type=_source, default=None,
+                       help="IMAGES[:LABELS] folder (repeatable; default: dataset train + synthetic)")
+        p.add_argument("--imgsz", type=int, default=IMGSZ)
+        p.add_argument("--cache-root", type=Path, default=CACHE_ROOT)
+        p.add_argument("--threads", type=int, default=THREADS)
+    b.add_argument("--force", action="store_true", help="rebuild even if up to date")
+    t.add_argument("--model", default="yolov8.yaml")
+    t.add_argument("--weights", default="yolov8n.pt")
+    t.add_argument("--data", default="dataset.yaml")
+    t.add_argument("--epochs", type=int, default=100)
+    t.add_argument("--batch", type=int, default=16)
+    t.add_argument("--workers", type=int, default=8)
+    args = ap.parse_args(argv)
+
+    cache_dir = build_cache(args.source or SOURCES, args.imgsz, args.cache_root, args.threads,
+                            getattr(args, "force", False))
+    if args.cmd == "train":
+        model = YOLO(args.model).load(args.weights)
+        model.train(data=args.data, trainer=make_trainer(cache_dir=cache_dir), epochs=args.epochs,
+                    imgsz=args.imgsz, batch=args.batch, workers=args.workers)
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
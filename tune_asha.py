@@ -0,0 +1,374 @@
+"""
+Parallel, resumable hyperparameter tuning with asynchronous successive halving.
+
+``finetune_yolo.py`` runs ``model.tune(...)`` one trial at a time and each
+``runs/detect/tune*`` folder starts from scratch.  This driver instead runs
+``--parallel`` trials at once in separate CPU processes, each limited to
+``--threads`` threads (data is loaded in the trial process unless
+``--workers`` is set), and stops weak trials early with ASHA:
+
+* rungs are at ``min_epochs · eta^k`` epochs (up to ``--epochs``);
+* after every epoch a trial reads its own ``results.csv``; when it reaches a
+  rung it is stopped unless its fitness is in the top ``1/eta`` of all
+  trials recorded at that rung so far.
+
+Results are appended to ``<tune-dir>/tune_results.csv`` (the ultralytics
+columns plus ``epochs``).  Re-running with the same ``--tune-dir`` resumes:
+finished trials are not repeated, the rungs are rebuilt from the trials'
+``results.csv`` and new candidates are mutated from the best rows so far.
+Rows of older ``runs/detect/tune*/tune_results.csv`` files can seed the
+search with ``--seed-from``::
+
+    python tune_asha.py --trials 64 --parallel 4 --threads 4 --epochs 27
+    python tune_asha.py --trials 128 --seed-from runs/detect/tune4/tune_results.csv
+"""
+
+import os
+import csv
+import math
+import random
+import argparse
+import threading
+from pathlib import Path
+from multiprocessing import get_context
+from multiprocessing.managers import BaseManager
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+DATA = 'dataset.yaml'
+MODEL = 'yolov8.yaml'
+WEIGHTS = 'yolov8n.pt'
+TUNE_DIR = Path('runs/detect/tune_asha')
+OPTIMIZER = 'AdamW'
+
+MAX_EPOCHS = 27
+MIN_EPOCHS = 1  #first rung
+ETA = 3  #keep the top 1/ETA at every rung
+THREADS = 4  #CPU threads per trial
+WORKERS = 0  #dataloader processes per trial; 0 keeps a trial within THREADS
+
+# (min, max) per hyperparameter – the ultralytics Tuner defaults
+SEARCH_SPACE = {
+    'lr0': (1e-5, 1e-1),
+    'lrf': (0.0001, 0.1),
+    'momentum': (0.7, 0.98),
+    'weight_decay': (0.0, 0.001),
+    'warmup_epochs': (0.0, 5.0),
+    'warmup_momentum': (0.0, 0.95),
+    'box': (1.0, 20.0),
+    'cls': (0.2, 4.0),
+    'dfl': (0.4, 6.0),
+    'hsv_h': (0.0, 0.1),
+    'hsv_s': (0.0, 0.9),
+    'hsv_v': (0.0, 0.9),
+    'degrees': (0.0, 45.0),
+    'translate': (0.0, 0.9),
+    'scale': (0.0, 0.95),
+    'shear': (0.0, 10.0),
+    'perspective': (0.0, 0.001),
+    'flipud': (0.0, 1.0),
+    'fliplr': (0.0, 1.0),
+    'bgr': (0.0, 1.0),
+    'mosaic': (0.0, 1.0),
+    'mixup': (0.0, 1.0),
+    'copy_paste': (0.0, 1.0),
+}
+COLUMNS = ['fitness', *SEARCH_SPACE, 'epochs']
+
+
+# ---------------------------------------------------------------------------
+# Results file
+# ---------------------------------------------------------------------------
+
+def results_fitness(results_csv):
+    """Latest ``(epoch, fitness)`` of a ``results.csv`` (0.1·mAP50 + 0.9·mAP50-95)."""
+    try:
+        with open(results_csv, newline='') as f:
+            rows = [{k.strip(): v for k, v in r.items()} for r in csv.DictReader(f)]
+    except OSError:
+        return 0, 0.0
+    if not rows:
+        return 0, 0.0
+    last = rows[-1]
+    fit = 0.1 * float(last['metrics/mAP50(B)']) + 0.9 * float(last['metrics/mAP50-95(B)'])
+    return int(float(last['epoch'])), 0.0 if math.isnan(fit) else fit
+
+
+def epoch_fitness(results_csv):
+    """``[(epoch, fitness)]`` for every row of a ``results.csv``."""
+    with open(results_csv, newline='') as f:
+        rows = [{k.strip(): v for k, v in r.items()} for r in csv.DictReader(f)]
+    out = []
+    for r in rows:
+        fit = 0.1 * float(r['metrics/mAP50(B)']) + 0.9 * float(r['metrics/mAP50-95(B)'])
+        out.append((int(float(r['epoch'])), 0.0 if math.isnan(fit) else fit))
+    return out
+
+
+def read_rows(path):
+    """Rows of a ``tune_results.csv`` as dicts of floats (ultralytics files have no ``epochs``)."""
+    path = Path(path)
+    if not path.exists():
+        return []
+    with open(path, newline='') as f:
+        return [{k: float(v) for k, v in r.items() if k in COLUMNS and v != ''}
+                for r in csv.DictReader(f)]
+
+
+class ResultsFile:
+    """Append-only ``tune_results.csv``; rows are flushed as trials finish.
+
+    An existing file whose header lacks some of ``COLUMNS`` (an ultralytics
+    ``tune_results.csv`` has no ``epochs``) is rewritten once with the
+    missing columns added, so appended rows line up with the header.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.rows = read_rows(self.path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        header, old = [], []
+        if self.path.exists():
+            with open(self.path, newline='') as f:
+                reader = csv.DictReader(f)
+                old = list(reader)
+                header = reader.fieldnames or []
+        fields = header + [c for c in COLUMNS if c not in header]
+        if header and fields != header:
+            tmp = self.path.with_suffix('.csv.tmp')
+            with open(tmp, 'w', newline='') as f:
+                w = csv.DictWriter(f, fields)
+                w.writeheader()
+                w.writerows(old)
+            os.replace(tmp, self.path)
+        self._f = open(self.path, 'a', newline='')
+        self._w = csv.DictWriter(self._f, fields, extrasaction='ignore')
+        if not header:
+            self._w.writeheader()
+
+    def append(self, row):
+        self.rows.append(row)
+        self._w.writerow({k: round(v, 5) if isinstance(v, float) else v for k, v in row.items()})
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+# ---------------------------------------------------------------------------
+# Search: mutation of the best rows so far
+# ---------------------------------------------------------------------------
+
+def default_hyp():
+    """The ultralytics training defaults for every tuned key."""
+    from ultralytics.cfg import get_cfg
+    cfg = vars(get_cfg())
+    return {k: float(cfg[k]) for k in SEARCH_SPACE}
+
+
+def propose(rows, rng, parents=5, sigma=0.2, prob=0.8):
+    """Mutate one of the best *parents* rows (weighted by fitness) into a new candidate.
+
+    Rows trained for more epochs rank first, so pruned trials do not
+    outrank finished ones on early-epoch fitness.
+    """
+    if not rows:
+        return default_hyp()
+    best = sorted(rows, key=lambda r: (r.get('epochs', 0), r['fitness']), reverse=True)[:parents]
+    weights = [r['fitness'] - min(b['fitness'] for b in best) + 1e-6 for r in best]
+    parent = rng.choices(best, weights)[0]
+    hyp = {}
+    while not hyp or all(hyp[k] == parent.get(k) for k in hyp):  #at least one gene changes
+        for k, (lo, hi) in SEARCH_SPACE.items():
+            v = parent.get(k, (lo + hi) / 2)
+            if rng.random() < prob:
+                v *= min(max(rng.gauss(1.0, sigma), 0.3), 3.0)
+            hyp[k] = round(min(max(v, lo), hi), 5)
+    return hyp
+
+
+# ---------------------------------------------------------------------------
+# ASHA scheduler (shared between the trial processes through a manager)
+# ---------------------------------------------------------------------------
+
+class ASHA:
+    """Asynchronous successive halving on per-epoch fitness.
+
+    :meth:`report` is called by every trial after every epoch and returns
+    False when the trial should stop.  A rung decision needs at least
+    ``eta`` recorded trials at that rung; before that, trials continue.
+    """
+
+    def __init__(self, max_epochs=MAX_EPOCHS, min_epochs=MIN_EPOCHS, eta=ETA):
+        self.eta = eta
+        self.rungs = {}
+        r = min_epochs
+        while r < max_epochs:
+            self.rungs[r] = {}
+            r *= eta
+        self.stopped = 0
+        self._lock = threading.Lock()
+
+    def report(self, trial, epoch, fitness):
+        if epoch not in self.rungs:
+            return True
+        with self._lock:
+            rung = self.rungs[epoch]
+            rung[trial] = fitness
+            if len(rung) < self.eta:
+                return True
+            ranked = sorted(rung.values(), reverse=True)
+            cutoff = ranked[max(len(ranked) // self.eta - 1, 0)]
+            keep = fitness >= cutoff
+            self.stopped += not keep
+            return keep
+
+    def restore(self, trial, history):
+        """Record a finished trial's ``[(epoch, fitness)]`` without deciding anything."""
+        with self._lock:
+            for epoch, fitness in history:
+                if epoch in self.rungs:
+                    self.rungs[epoch][trial] = fitness
+
+    def summary(self):
+        with self._lock:
+            return {epoch: len(r) for epoch, r in self.rungs.items()}, self.stopped
+
+
+class TuneManager(BaseManager):
+    pass
+
+
+TuneManager.register('ASHA', ASHA)
+
+
+# ---------------------------------------------------------------------------
+# Trial process
+# ---------------------------------------------------------------------------
+
+_SCHEDULER = None
+
+
+def _init_trial(threads, scheduler):
+    # must run before torch/cv2 create their thread pools
+    global _SCHEDULER
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    import cv2
+    import torch
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+    _SCHEDULER = scheduler
+
+
+def run_trial(task):
+    """Train one candidate until ASHA stops it; return ``(name, row)``."""
+    name, hyp, cfg = task
+    from ultralytics import YOLO
+
+    model = YOLO(cfg['model']).load(cfg['weights'])
+
+    def on_fit_epoch_end(trainer):
+        epoch, fit = results_fitness(Path(trainer.save_dir) / 'results.csv')
+        if epoch and not _SCHEDULER.report(name, epoch, fit):
+            trainer.stop = True
+
+    model.add_callback('on_fit_epoch_end', on_fit_epoch_end)
+    model.train(data=cfg['data'], epochs=cfg['epochs'], imgsz=cfg['imgsz'], batch=cfg['batch'],
+                optimizer=cfg['optimizer'], device='cpu', workers=cfg['workers'],
+                project=cfg['project'], name=name, exist_ok=True, plots=False, verbose=False,
+                **hyp)
+    history = epoch_fitness(Path(cfg['project']) / name / 'results.csv')
+    epochs = history[-1][0] if history else 0
+    return name, {'fitness': max((f for _, f in history), default=0.0), **hyp, 'epochs': epochs}
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+def trial_dirs(tune_dir):
+    return sorted(p for p in (Path(tune_dir) / 'trials').glob('trial_*') if (p / 'results.csv').exists())
+
+
+def next_trial_id(tune_dir):
+    """One past the highest ``trial_*`` index, counting failed and unfinished trials too."""
+    ids = [int(p.name[6:]) for p in (Path(tune_dir) / 'trials').glob('trial_*') if p.name[6:].isdigit()]
+    return max(ids, default=-1) + 1
+
+
+def tune(args):
+    tune_dir = Path(args.tune_dir)
+    results = ResultsFile(tune_dir / 'tune_results.csv')
+    pool_rows = list(results.rows)
+    for path in args.seed_from:
+        pool_rows += read_rows(path)
+    done = len(results.rows)
+    if done:
+        print(f"Resuming {tune_dir}: {done} trials done, best fitness "
+              f"{max(r['fitness'] for r in results.rows):.4f}")
+
+    manager = TuneManager(ctx=get_context('spawn'))
+    manager.start()
+    scheduler = manager.ASHA(args.epochs, args.min_epochs, args.eta)
+    for d in trial_dirs(tune_dir):
+        scheduler.restore(d.name, epoch_fitness(d / 'results.csv'))
+
+    cfg = dict(model=args.model, weights=args.weights, data=args.data, epochs=args.epochs,
+               imgsz=args.imgsz, batch=args.batch, optimizer=args.optimizer, workers=args.workers,
+               project=str((tune_dir / 'trials').resolve()))
+    rng = random.Random(args.seed + done)
+    next_id = next_trial_id(tune_dir)
+    todo = max(args.trials - done, 0)
+    running = {}
+    with ProcessPoolExecutor(args.parallel, mp_context=get_context('spawn'),
+                             initializer=_init_trial, initargs=(args.threads, scheduler)) as pool:
+        while todo or running:
+            while todo and len(running) < args.parallel:
+                name = f'trial_{next_id:04d}'
+                next_id += 1
+                todo -= 1
+                running[pool.submit(run_trial, (name, propose(pool_rows, rng), cfg))] = name
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name = running.pop(fut)
+                try:
+                    _, row = fut.result()
+                except Exception as exc:
+                    print(f"⚠️ {name} failed: {exc}")
+                    continue
+                results.append(row)
+                pool_rows.append(row)
+                best = max(r['fitness'] for r in results.rows)
+                print(f"{name}: fitness {row['fitness']:.4f} after {row['epochs']} epochs "
+                      f"({len(results.rows)}/{args.trials}, best {best:.4f})")
+    rungs, stopped = scheduler.summary()
+    manager.shutdown()
+    results.close()
+    print(f"✅ {len(results.rows)} trials in {results.path}; {stopped} stopped early this run, "
+          f"trials per rung: {rungs}")
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Parallel, resumable YOLO tuning with ASHA early stopping.")
+    ap.add_argument('--data', default=DATA)
+    ap.add_argument('--model', default=MODEL)
+    ap.add_argument('--weights', default=WEIGHTS)
+    ap.add_argument('--optimizer', default=OPTIMIZER)
+    ap.add_argument('--imgsz', type=int, default=640)
+    ap.add_argument('--batch', type=int, default=8)
+    ap.add_argument('--tune-dir', default=str(TUNE_DIR), help="results folder; re-use it to resume")
+    ap.add_argument('--seed-from', nargs='*', default=[], help="other tune_results.csv files to mutate from")
+    ap.add_argument('--trials', type=int, default=32, help="total trials in --tune-dir, including earlier runs")
+    ap.add_argument('--parallel', type=int, default=max((os.cpu_count() or 1) // THREADS, 1))
+    ap.add_argument('--threads', type=int, default=THREADS, help="CPU threads per trial")
+    ap.add_argument('--workers', type=int, default=WORKERS,
+                    help="dataloader processes per trial, each on top of --threads (0 = load in the trial)")
+    ap.add_argument('--epochs', type=int, default=MAX_EPOCHS, help="epochs of a trial that is never stopped")
+    ap.add_argument('--min-epochs', type=int, default=MIN_EPOCHS, help="first ASHA rung")
+    ap.add_argument('--eta', type=int, default=ETA)
+    ap.add_argument('--seed', type=int, default=0)
+    return ap.parse_args(argv)
+
+
+if __name__ == '__main__':
+    tune(parse_args())
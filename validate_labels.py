@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Validate YOLO label folders and report label statistics.
+
+All label files of a source are read on a thread pool and parsed into one
+``(boxes, 5)`` array, with a parallel array of file indices.  Every check
+is then a vectorised expression over that array:
+
+* malformed files (rows that are not ``class cx cy w h``)
+* class ids that are not integers in ``[0, nc)`` (``nc``/``names`` from
+  ``dataset.yaml``; the misspelt names are intentional and not checked)
+* non-positive sizes, and boxes that leave ``[0, 1]``
+* duplicate rows within a file
+* images without a label file and label files without an image
+
+followed by per-class box counts and histograms of the normalised box
+width and height::
+
+    python validate_labels.py                       # dataset/ train+val and synthetic_labels/
+    python validate_labels.py synthetic_dataset:synthetic_labels --json stats.json
+
+The exit status is 1 if any check failed.
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import yaml
+
+import lableing
+
+DATASET_YAML = Path("dataset.yaml")
+THREADS = 16
+EPS = 1e-6                      # rounding slack of the 6-decimal label format
+SIZE_BINS = (0, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+SHOW = 5                        # offending rows listed per check
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp"}
+# (image folder, label folder)
+SOURCES = [
+    (Path("dataset/images/train"), Path("dataset/labels/train")),
+    (Path("dataset/images/val"), Path("dataset/labels/val")),
+    (lableing.OUT_IMG_DIR, lableing.OUT_LABEL_DIR),
+]
+
+# ---------------------------------------------------------------------------
+# 1. Loading
+# ---------------------------------------------------------------------------
+
+def read_classes(path=DATASET_YAML):
+    """``(nc, names)`` from a YOLO dataset yaml."""
+    with open(path, encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    names = data.get("names", [])
+    if isinstance(names, dict):
+        names = [names[k] for k in sorted(names)]
+    return int(data.get("nc", len(names))), list(names)
+
+def pair_files(img_dir: Path, label_dir: Path):
+    """``(label_files, images_without_labels, labels_without_images)`` by file stem."""
+    images = {p.stem: p for p in img_dir.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES} \
+        if img_dir.is_dir() else {}
+    labels = {p.stem: p for p in label_dir.glob("*.txt")} if label_dir.is_dir() else {}
+    return ([labels[s] for s in sorted(labels)],
+            [images[s] for s in sorted(images.keys() - labels.keys())],
+            [labels[s] for s in sorted(labels.keys() - images.keys())])
+
+def _parse(path: Path):
+    """Rows of one label file as ``(n, 5)`` float64, or ``None`` if it is malformed."""
+    text = path.read_bytes()
+    tokens = text.split()
+    rows = sum(1 for line in text.splitlines() if line.strip())
+    if len(tokens) != 5 * rows:
+        return None
+    try:
+        return np.array(tokens, np.float64).reshape(rows, 5)
+    except ValueError:
+        return None
+
+def load_labels(files, threads=THREADS):
+    """Parse *files* into ``(rows (m, 5), file_index (m,), malformed file indices)``."""
+    with ThreadPoolExecutor(threads) as pool:
+        parsed = list(pool.map(_parse, files, chunksize=64))
+    malformed = [i for i, a in enumerate(parsed) if a is None]
+    counts = np.array([0 if a is None else len(a) for a in parsed], np.int64)
+    arrays = [a for a in parsed if a is not None and len(a)]
+    rows = np.concatenate(arrays) if arrays else np.zeros((0, 5))
+    return rows, np.repeat(np.arange(len(files)), counts), malformed
+
+# ---------------------------------------------------------------------------
+# 2. Checks and statistics
+# ---------------------------------------------------------------------------
+
+def check_rows(rows, file_index, nc):
+    """Boolean mask per failed check, over the rows of :func:`load_labels`."""
+    cls, cx, cy, w, h = rows.T
+    finite = np.isfinite(rows).all(axis=1)
+    # sorting (file, row) as one opaque 48-byte key is ~4× faster than np.lexsort on six keys
+    keys = np.ascontiguousarray(np.c_[file_index, rows], np.float64).view(np.dtype((np.void, 48))).ravel()
+    order = np.argsort(keys, kind="stable")
+    dup = np.zeros(len(rows), bool)
+    dup[order[1:][keys[order][1:] == keys[order][:-1]]] = True
+    return {
+        "non-finite value": ~finite,
+        "class not an integer": finite & (cls != np.round(cls)),
+        "class outside [0, nc)": finite & ((cls < 0) | (cls >= nc)),
+        "non-positive size": finite & ((w <= 0) | (h <= 0)),
+        "box outside [0, 1]": finite & ((cx - w / 2 < -EPS) | (cy - h / 2 < -EPS)
+                                        | (cx + w / 2 > 1 + EPS) | (cy + h / 2 > 1 + EPS)),
+        "duplicate row": dup,
+    }
+
+def label_stats(rows, nc, bins=SIZE_BINS):
+    """Per-class counts and mean sizes plus width/height histograms of the valid rows."""
+    cls = rows[:, 0].astype(np.int64)
+    counts = np.bincount(cls, minlength=nc)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_w = np.bincount(cls, rows[:, 3], minlength=nc) / counts
+        mean_h = np.bincount(cls, rows[:, 4], minlength=nc) / counts
+    return {
+        "boxes": int(len(rows)),
+        "class_counts": counts.tolist(),
+        "class_mean_w": np.nan_to_num(mean_w).round(4).tolist(),
+        "class_mean_h": np.nan_to_num(mean_h).round(4).tolist(),
+        "size_bins": list(bins),
+        "width_hist": np.histogram(rows[:, 3], bins)[0].tolist(),
+        "height_hist": np.histogram(rows[:, 4], bins)[0].tolist(),
+    }
+
+def validate(img_dir, label_dir, nc, threads=THREADS):
+    """Check one image/label folder pair; returns a JSON-serialisable report."""
+    t0 = time.perf_counter()
+    files, no_label, no_image = pair_files(Path(img_dir), Path(label_dir))
+    rows, file_index, malformed = load_labels(files, threads)
+    t_load = time.perf_counter() - t0
+    failed = check_rows(rows, file_index, nc)
+    bad = np.logical_or.reduce(list(failed.values())) if len(rows) else np.zeros(0, bool)
+    line = np.arange(len(rows)) - np.searchsorted(file_index, file_index)  # row within its file
+    errors = {"malformed file": [str(files[i]) for i in malformed],
+              "image without labels": [str(p) for p in no_label],
+              "labels without image": [str(p) for p in no_image]}
+    for name, mask in failed.items():
+        errors[name] = [f"{files[file_index[i]]}:{line[i] + 1}" for i in np.flatnonzero(mask)]
+    return {
+        "images": str(img_dir), "labels": str(label_dir), "label_files": len(files),
+        "load_s": round(t_load, 3), "check_s": round(time.perf_counter() - t0 - t_load, 3),
+        "errors": errors, **label_stats(rows[~bad], nc),
+    }
+
+# ---------------------------------------------------------------------------
+# 3. Report
+# ---------------------------------------------------------------------------
+
+def _bar(n, total, width=30):
+    return "█" * round(width * n / total) if total else ""
+
+def print_report(report, names):
+    print(f"\n▶ {report['labels']} ({report['label_files']} files, {report['boxes']} valid boxes; "
+          f"read {report['load_s']:.2f} s, checked {report['check_s']:.2f} s)")
+    n_errors = 0
+    for check, where in report["errors"].items():
+        if where:
+            n_errors += len(where)
+            shown = ", ".join(where[:SHOW]) + (" …" if len(where) > SHOW else "")
+            print(f"⚠️ {len(where)} × {check}: {shown}")
+    if not n_errors:
+        print("✅ all checks passed")
+    total = report["boxes"]
+    print(f"  {'class':<42} {'boxes':>7} {'share':>6} {'mean w':>7} {'mean h':>7}")
+    for c, n in enumerate(report["class_counts"]):
+        name = names[c] if c < len(names) else str(c)
+        print(f"  {c:>2} {name:<39} {n:>7} {n / max(total, 1):>6.1%} "
+              f"{report['class_mean_w'][c]:>7.3f} {report['class_mean_h'][c]:>7.3f}"
+              + ("   ⚠️ no boxes" if n == 0 else ""))
+    bins = report["size_bins"]
+    for axis in ("width", "height"):
+        print(f"  box {axis} (fraction of image):")
+        for lo, hi, n in zip(bins, bins[1:], report[f"{axis}_hist"]):
+            print(f"    {lo:>5.2f}–{hi:<5.2f} {n:>8} {_bar(n, total)}")
+    return n_errors
+
+# ---------------------------------------------------------------------------
+# 4. Main entry point
+# ---------------------------------------------------------------------------
+
+def _source(arg):
+    img, _, lbl = arg.partition(":")
+    if not lbl:
+        raise argparse.ArgumentTypeError("expected IMAGE_DIR:LABEL_DIR")
+    return Path(img), Path(lbl)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Validate YOLO label folders and report class statistics.")
+    ap.add_argument("sources", nargs="*", type=_source, metavar="IMAGE_DIR:LABEL_DIR",
+                    help="folder pairs to check (default: dataset train/val and the synthetic set)")
+    ap.add_argument("--data", type=Path, default=DATASET_YAML, help="dataset yaml with nc and names")
+    ap.add_argument("--threads", type=int, default=THREADS)
+    ap.add_argument("--json", type=Path, default=None, help="also write the reports as JSON")
+    args = ap.parse_args(argv)
+    nc, names = read_classes(args.data)
+    if nc != len(names):
+        print(f"⚠️ {args.data}: nc is {nc} but {len(names)} names are listed")
+    reports, n_errors = [], 0
+    for img_dir, label_dir in args.sources or SOURCES:
+        if not label_dir.is_dir():
+            print(f"⚠️ {label_dir} does not exist – skipped")
+            continue
+        reports.append(validate(img_dir, label_dir, nc, args.threads))
+        n_errors += print_report(reports[-1], names)
+    if args.json:
+        args.json.write_text(json.dumps({"nc": nc, "names": names, "sources": reports}, indent=2))
+        print(f"\nReports written to {args.json}")
+    return 1 if n_errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,48 +1,542 @@
-from ultralytics import YOLO 
+"""
+YOLO inference on BMS screenshots.
+
+Without arguments the original behaviour is kept: one image is predicted,
+annotated and shown in a window.  Pass images, folders or glob patterns to
+run headless batched inference and write the detections to JSONL or CSV::
+
+    python yolo_predict.py cropped_enhanced/ --batch 16 --out detections.jsonl
+
+Screenshots much larger than ``--imgsz`` lose their small symbols when
+downscaled; ``--tile 640`` predicts overlapping full-resolution tiles
+instead and merges them back with class-wise NMS or WBF::
+
+    python yolo_predict.py cropped_enhanced/ --tile 640 --overlap 0.25 --merge wbf
+
+Batched (untiled) results are cached by image content, weights hash and
+``imgsz``/``iou`` (see ``predict_cache.py``); re-running on unchanged
+images only re-applies ``--conf`` and never loads the model.
+"""
+
+import csv
+import glob
+import json
+import time
+import queue
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from ultralytics import YOLO
 from PIL import Image
 import cv2
 import numpy as np
 
-model = YOLO('runs/detect/train7/weights/best.pt')
+import predict_cache
+from lableing import tile_grid  #same tiling as the generator's --tile output
+
+WEIGHTS = 'runs/detect/train7/weights/best.pt'
+IMAGE = 'cropped_enhanced/Bild9.png'
+IMGSZ = 640  #match training size
+BATCH_SIZE = 8
+PREFETCH = 2  #decoded batches kept ready ahead of the model
+TILE_OVERLAP = 0.2  #fraction of the tile shared with its neighbour
+MERGE_IOU = 0.5  #tiled mode: boxes above this overlap are merged
+IMAGE_SUFFIXES = {'.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp'}
+BACKENDS = ('pt', 'onnx', 'onnx-int8', 'openvino-int8')  #see export_quantized.py
+
+
+def backend_weights(weights, backend='pt'):
+    """Path of the *backend* export that ``export_quantized.py`` writes next to *weights*."""
+    weights = Path(weights)
+    return {
+        'pt': weights,
+        'onnx': weights.with_suffix('.onnx'),
+        'onnx-int8': weights.with_name(f'{weights.stem}_int8.onnx'),
+        'openvino-int8': weights.with_name(f'{weights.stem}_int8_openvino_model'),
+    }[backend]
+
+
+def load_model(weights=WEIGHTS, backend='pt'):
+    path = backend_weights(weights, backend)
+    if not path.exists():
+        raise SystemExit(f"{path} not found – run export_quantized.py first")
+    return YOLO(str(path), task='detect')
+
+
+class LazyModel:
+    """Loads the weights on the first ``predict`` – fully cached runs never build the model."""
+
+    def __init__(self, weights=WEIGHTS, backend='pt'):
+        self.weights, self.backend = weights, backend
+        self.path = backend_weights(weights, backend)
+        self._model = None
+
+    def predict(self, *args, **kwargs):
+        if self._model is None:
+            self._model = load_model(self.weights, self.backend)
+        return self._model.predict(*args, **kwargs)
+
+
+FONT, FONT_SCALE, FONT_THICKNESS = cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1
+BOX_COLOR, TEXT_COLOR = (0, 0, 255), (255, 255, 255)  #red box, white label text
+_LABEL_SIZES = {}
+_LABEL_PATCHES = {}
+MAX_LABEL_PATCHES = 8192  #49 classes × 100 confidence values fit comfortably
+
+
+def label_size(class_name):
+    """Cached ``(width, height, baseline)`` of ``'<name> 0.00'``.
+
+    Hershey digits share one advance width, so the size only depends on the
+    class name and is measured once per class.
+    """
+    size = _LABEL_SIZES.get(class_name)
+    if size is None:
+        (w, h), baseline = cv2.getTextSize(f'{class_name} 0.00', FONT, FONT_SCALE, FONT_THICKNESS)
+        size = _LABEL_SIZES[class_name] = (w, h, baseline)
+    return size
+
+
+def label_patch(class_name, text):
+    """Pre-rendered label (white text on red) for *text*, cached by text.
+
+    ``cv2.putText`` dominates drawing time on dense diagrams; a cached
+    patch is pasted with one slice assignment instead.
+    """
+    patch = _LABEL_PATCHES.get(text)
+    if patch is None:
+        w, h, baseline = label_size(class_name)
+        patch = np.empty((h + baseline + 1, w + 1, 3), np.uint8)  #cv2.rectangle is end-inclusive
+        patch[:] = BOX_COLOR
+        cv2.putText(patch, text, (0, h), FONT, FONT_SCALE, TEXT_COLOR, FONT_THICKNESS)
+        if len(_LABEL_PATCHES) >= MAX_LABEL_PATCHES:
+            _LABEL_PATCHES.clear()
+        _LABEL_PATCHES[text] = patch
+    return patch
+
+
+def draw_detections(image, xyxy, conf, cls, class_names):
+    """Draw red boxes with 'name conf' labels onto a BGR image in place.
+
+    *xyxy*, *conf* and *cls* are NumPy arrays (see :func:`result_arrays`);
+    coordinates and label texts are prepared for all boxes at once and
+    labels are pasted from :func:`label_patch`.
+    """
+    if len(xyxy) == 0:
+        return image
+    H, W = image.shape[:2]
+    boxes = np.asarray(xyxy).astype(int)
+    names = [class_names[c] for c in np.asarray(cls, int)]
+    texts = [f'{n} {s:.2f}' for n, s in zip(names, conf)]
+    for (x1, y1, x2, y2), name, text in zip(boxes.tolist(), names, texts):
+        cv2.rectangle(image, (x1, y1), (x2, y2), BOX_COLOR, 2)  #bounding box
+        #label above the bounding box, clipped to the image
+        patch = label_patch(name, text)
+        ph, pw = patch.shape[:2]
+        top = y1 + 1 - ph
+        ty, tx = max(top, 0), max(x1, 0)
+        by, bx = min(y1 + 1, H), min(x1 + pw, W)
+        if ty < by and tx < bx:
+            image[ty:by, tx:bx] = patch[ty - top:by - top, tx - x1:bx - x1]
+    return image
+
+
+class AnnotationWriter:
+    """Renders and saves annotated images on a thread pool (headless).
+
+    At most ``2 * threads`` images are queued; :meth:`submit` blocks until
+    a slot frees up and raises the first error of an earlier render.
+    """
+
+    def __init__(self, out_dir, threads=4):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self._pool = ThreadPoolExecutor(threads)
+        self._slots = threading.BoundedSemaphore(2 * threads)
+        self._pending = []
+
+    def _render(self, image, xyxy, conf, cls, class_names, name):
+        try:
+            draw_detections(image, xyxy, conf, cls, class_names)
+            if not cv2.imwrite(str(self.out_dir / name), image):
+                raise OSError(f"Could not write {self.out_dir / name}")
+        finally:
+            self._slots.release()
+
+    def _raise_failed(self):
+        for f in self._pending:
+            if f.done() and f.exception():
+                raise f.exception()
+        self._pending = [f for f in self._pending if not f.done()]
+
+    def submit(self, image, xyxy, conf, cls, class_names, name):
+        """Queue *image* (drawn on in place – pass a copy to keep it) for saving as *name*."""
+        self._raise_failed()
+        self._slots.acquire()
+        self._pending.append(self._pool.submit(self._render, image, xyxy, conf, cls,
+                                               class_names, name))
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        for f in self._pending:
+            f.result()
+
+
+def show_single(model, path=IMAGE, imgsz=IMGSZ):
+    """Predict one image, show it annotated and print the detections."""
+    im = Image.open(path)
+
+    results = model.predict(source=im, imgsz=imgsz, save=True)
+    image = cv2.cvtColor(np.array(im), cv2.COLOR_RGB2BGR)
+
+    detection_results = results[0]
+    xyxy, scores, class_ids = result_arrays(detection_results)  #one conversion for drawing and printing
+    class_names = detection_results.names #access the class names
+
+    draw_detections(image, xyxy, scores, class_ids, class_names)
+
+    cv2.imshow('Annotated Image', image)
+    cv2.waitKey(0)
+    cv2.destroyAllWindows()
+
+    print("Detected objects with confidence scores:")
+    for box, score, class_id in zip(xyxy, scores, class_ids):
+        print(f"Class: {class_names[class_id]}, Confidence: {score:.4f}, Box: {box}")
+
+
+# ---------------------------------------------------------------------------
+# Batched, headless mode
+# ---------------------------------------------------------------------------
+
+def iter_image_paths(sources):
+    """Expand files, folders and glob patterns into a sorted list of images."""
+    paths = []
+    for src in sources:
+        p = Path(src)
+        if p.is_dir():
+            paths += [q for q in p.iterdir() if q.suffix.lower() in IMAGE_SUFFIXES]
+        elif p.is_file():
+            paths.append(p)
+        else:
+            paths += [Path(q) for q in glob.glob(src, recursive=True)
+                      if Path(q).suffix.lower() in IMAGE_SUFFIXES]
+    return sorted(set(paths))
+
+
+def _prefetch(produce, depth=PREFETCH):
+    """Run generator *produce* on a background thread, at most *depth* items ahead.
+
+    An exception in *produce* is re-raised in the consumer.
+    """
+    items = queue.Queue(maxsize=depth)
+    error = []
+
+    def run():
+        try:
+            for item in produce:
+                items.put(item)
+        except BaseException as exc:
+            error.append(exc)
+        finally:
+            items.put(None)
+
+    threading.Thread(target=run, daemon=True).start()
+    while (item := items.get()) is not None:
+        yield item
+    if error:
+        raise error[0]
+
+
+def prefetch_batches(paths, batch_size=BATCH_SIZE, depth=PREFETCH):
+    """Yield ``(paths, bgr_images)`` batches decoded on a background thread.
+
+    Unreadable files are reported and skipped.  At most *depth* batches
+    are decoded ahead, so memory stays bounded on large folders.
+    """
+    def decode():
+        for i in range(0, len(paths), batch_size):
+            chunk, images = [], []
+            for p in paths[i:i + batch_size]:
+                img = cv2.imread(str(p), cv2.IMREAD_COLOR)
+                if img is None:
+                    print(f"⚠️ Could not read {p}")
+                    continue
+                chunk.append(p)
+                images.append(img)
+            if chunk:
+                yield chunk, images
+
+    return _prefetch(decode(), depth)
+
+
+def result_arrays(result):
+    """Return ``(xyxy, conf, cls)`` NumPy arrays for one ultralytics result."""
+    boxes = result.boxes
+    return (boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(),
+            boxes.cls.cpu().numpy().astype(int))
+
+
+def detections_from_arrays(xyxy, conf, cls, names):
+    return [{'class': names[c], 'confidence': round(float(s), 4),
+             'xyxy': [round(float(v), 1) for v in b]}
+            for b, s, c in zip(xyxy, conf, cls)]
+
+
+def detections(result):
+    """Convert one ultralytics result into ``[{class, confidence, xyxy}]``."""
+    return detections_from_arrays(*result_arrays(result), result.names)
+
+
+def predict_batches(model, paths, batch_size=BATCH_SIZE, imgsz=IMGSZ, conf=0.25, iou=0.7):
+    """Yield ``(path, image, result)`` for every readable image in *paths*."""
+    for chunk, images in prefetch_batches(paths, batch_size):
+        results = model.predict(source=images, imgsz=imgsz, conf=conf, iou=iou,
+                                batch=len(images), save=False, verbose=False)
+        yield from zip(chunk, images, results)
+
+
+def predict_cached(model, paths, cache, weights_hash, batch_size=BATCH_SIZE, imgsz=IMGSZ,
+                   conf=0.25, iou=0.7, need_images=False):
+    """Like :func:`predict_batches` via *cache*; yields ``(path, image, arrays, names)``.
+
+    Files are read and hashed on the prefetch thread; images with a cache
+    entry are not decoded unless *need_images*.  Misses are predicted at
+    ``predict_cache.RAW_CONF`` and stored, and *conf* is applied to every
+    result afterwards.
+    """
+    def load():
+        for i in range(0, len(paths), batch_size):
+            batch = []
+            for p in paths[i:i + batch_size]:
+                try:
+                    data = p.read_bytes()
+                except OSError:
+                    print(f"⚠️ Could not read {p}")
+                    continue
+                key = cache.key(predict_cache.file_digest(data), weights_hash, imgsz=imgsz, iou=iou,
+                                raw_conf=predict_cache.RAW_CONF)
+                entry = cache.get(key)
+                img = None
+                if entry is None or need_images:
+                    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+                    if img is None:
+                        print(f"⚠️ Could not read {p}")
+                        continue
+                batch.append([p, img, key, entry])
+            if batch:
+                yield batch
+
+    for batch in _prefetch(load()):
+        misses = [item for item in batch if item[3] is None]
+        if misses:
+            results = model.predict(source=[item[1] for item in misses], imgsz=imgsz,
+                                    conf=predict_cache.RAW_CONF, iou=iou, batch=len(misses),
+                                    save=False, verbose=False)
+            for item, result in zip(misses, results):
+                item[3] = (*result_arrays(result), result.names)
+                cache.put(item[2], *item[3])
+        for path, img, _, (xyxy, scores, cls, names) in batch:
+            yield path, img, predict_cache.apply_threshold(xyxy, scores, cls, conf), names
+
+
+# ---------------------------------------------------------------------------
+# Tiled mode
+# ---------------------------------------------------------------------------
+
+def pairwise_overlap(a, b, metric='iou'):
+    """IoU (or intersection over the smaller box, ``'ios'``) of every a×b pair."""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    if metric == 'ios':
+        denom = np.minimum(area_a[:, None], area_b[None, :])
+    else:
+        denom = area_a[:, None] + area_b[None, :] - inter
+    return inter / np.maximum(denom, 1e-9)
+
+
+def merge_detections(xyxy, conf, cls, threshold=MERGE_IOU, method='nms', metric='ios'):
+    """Class-wise NMS or weighted box fusion of overlapping detections.
+
+    Boxes are visited by descending confidence; each one absorbs every
+    remaining box of its class that overlaps it by more than *threshold*.
+    ``nms`` keeps the leader unchanged, ``wbf`` replaces it with the
+    confidence-weighted mean of its cluster.  The default ``ios`` metric
+    also merges a box cut at a tile border with its complete twin.
+    """
+    if len(xyxy) == 0:
+        return xyxy, conf, cls
+    order = np.argsort(-conf, kind='stable')
+    xyxy, conf, cls = xyxy[order], conf[order], cls[order]
+    same_class = cls[:, None] == cls[None, :]
+    overlap = pairwise_overlap(xyxy, xyxy, metric) > threshold
+    absorbs = same_class & overlap
+    alive = np.ones(len(xyxy), bool)
+    keep_boxes, keep_conf, keep_cls = [], [], []
+    for i in range(len(xyxy)):
+        if not alive[i]:
+            continue
+        members = absorbs[i] & alive
+        alive &= ~members
+        if method == 'wbf':
+            w = conf[members]
+            keep_boxes.append((xyxy[members] * w[:, None]).sum(0) / w.sum())
+        else:
+            keep_boxes.append(xyxy[i])
+        keep_conf.append(conf[i])
+        keep_cls.append(cls[i])
+    return np.array(keep_boxes), np.array(keep_conf), np.array(keep_cls)
+
+
+def predict_tiled(model, image, tile=IMGSZ, overlap=TILE_OVERLAP, batch_size=BATCH_SIZE,
+                  conf=0.25, iou=0.7, merge='nms', merge_threshold=MERGE_IOU):
+    """Predict a large BGR image tile by tile; return global ``(xyxy, conf, cls), names``."""
+    h, w = image.shape[:2]
+    origins = [(x, y) for x, y, _, _ in tile_grid(w, h, tile, overlap)]
+    boxes, scores, classes, names = [], [], [], {}
+    for i in range(0, len(origins), batch_size):
+        batch = origins[i:i + batch_size]
+        crops = [image[y:y + tile, x:x + tile] for x, y in batch]
+        results = model.predict(source=crops, imgsz=tile, conf=conf, iou=iou,
+                                batch=len(crops), save=False, verbose=False)
+        for (x, y), result in zip(batch, results):
+            b, s, c = result_arrays(result)
+            boxes.append(b + np.array([x, y, x, y], b.dtype))
+            scores.append(s)
+            classes.append(c)
+            names = result.names
+    xyxy, conf_, cls = (np.concatenate(boxes).reshape(-1, 4), np.concatenate(scores),
+                        np.concatenate(classes))
+    return merge_detections(xyxy, conf_, cls, merge_threshold, merge), names
+
+
+class DetectionWriter:
+    """Write detections as JSONL (one line per image) or CSV (one row per box)."""
 
-im = Image.open('cropped_enhanced/Bild9.png')
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, 'w', newline='')
+        self._csv = None
+        if self.path.suffix.lower() == '.csv':
+            self._csv = csv.writer(self._f)
+            self._csv.writerow(['image', 'class', 'confidence', 'x1', 'y1', 'x2', 'y2'])
 
-results = model.predict(source=im, imgsz=640, save=True)  #set imgsz to 640 to match training size
-image = cv2.cvtColor(np.array(im), cv2.COLOR_RGB2BGR)
+    def write(self, image_path, dets, **extra):
+        if self._csv is None:
+            self._f.write(json.dumps({'image': str(image_path), **extra, 'detections': dets}) + '\n')
+        else:
+            for d in dets:
+                self._csv.writerow([str(image_path), d['class'], d['confidence'], *d['xyxy']])
 
+    def close(self):
+        self._f.close()
 
-detection_results = results[0]
 
+def run_batched(model, sources, out, batch_size=BATCH_SIZE, imgsz=IMGSZ, conf=0.25, iou=0.7,
+                tile=None, overlap=TILE_OVERLAP, merge='nms', save_dir=None,
+                cache=None, weights_hash=None):
+    """Predict every image in *sources* and write the detections to *out*.
 
-boxes = detection_results.boxes  #contain all detected bounding boxes
-scores = boxes.conf  #confidence scores for each detected object
-class_ids = boxes.cls  #class indices for each detected object
+    With *tile* set each image is predicted tile by tile (see
+    :func:`predict_tiled`) and its latency is recorded per image.  With
+    *save_dir* annotated copies are rendered there in the background.
+    Untiled runs go through *cache* (a ``predict_cache.ResultCache``) when
+    given, keyed with *weights_hash*.
+    """
+    paths = iter_image_paths(sources)
+    if not paths:
+        raise SystemExit(f"No images found in {', '.join(map(str, sources))}")
+    writer = DetectionWriter(out)
+    renderer = AnnotationWriter(save_dir) if save_dir else None
+    n = boxes = 0
+    latencies = []
 
+    def predictions():
+        if tile:
+            for chunk, images in prefetch_batches(paths, 1):
+                t = time.perf_counter()
+                arrays, names = predict_tiled(model, images[0], tile, overlap, batch_size,
+                                              conf, iou, merge)
+                latencies.append(time.perf_counter() - t)
+                yield chunk[0], images[0], arrays, names, {'latency_ms': round(latencies[-1] * 1000, 1)}
+        elif cache is not None:
+            for path, image, arrays, names in predict_cached(
+                    model, paths, cache, weights_hash, batch_size, imgsz, conf, iou,
+                    need_images=renderer is not None):
+                yield path, image, arrays, names, {}
+        else:
+            for path, image, result in predict_batches(model, paths, batch_size, imgsz, conf, iou):
+                yield path, image, result_arrays(result), result.names, {}
 
-class_names = detection_results.names #access the class names
+    t0 = time.perf_counter()
+    try:
+        for path, image, arrays, names, extra in predictions():
+            dets = detections_from_arrays(*arrays, names)
+            writer.write(path, dets, **extra)
+            if renderer is not None:
+                renderer.submit(image, *arrays, names, Path(path).name)
+            n += 1
+            boxes += len(dets)
+    finally:
+        writer.close()
+        if renderer is not None:
+            renderer.close()
+    dt = time.perf_counter() - t0
+    print(f"✅ {n} images, {boxes} detections in {dt:.1f} s "
+          f"({n / dt:.1f} images/s, batch {batch_size}) → {out}")
+    if cache is not None and not tile:
+        print(f"   cache: {cache.hits} hits, {cache.misses} misses ({cache.dir})")
+    if latencies:
+        ms = np.array(latencies) * 1000
+        print(f"   tiled latency per image: mean {ms.mean():.0f} ms, "
+              f"p50 {np.percentile(ms, 50):.0f} ms, max {ms.max():.0f} ms")
 
-#annotate the image with bounding boxes and labels
-for box, score, class_id in zip(boxes.xyxy, scores, class_ids):
-    class_name = class_names[int(class_id)]  #get class name from class index
-    x1, y1, x2, y2 = map(int, box)  #convert box coordinates to integers
-    label = f'{class_name} {score:.2f}'  #create label with class name and confidence score
-    
-    #bounding box
-    cv2.rectangle(image, (x1, y1), (x2, y2), (0, 0, 255), 2)  #red bounding box
-    
-    #label above the bounding box
-    (label_width, label_height), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
-    cv2.rectangle(image, (x1, y1 - label_height - baseline), (x1 + label_width, y1), (0, 0, 255), -1)  #red background for text
-    cv2.putText(image, label, (x1, y1 - baseline), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)  #white ;abel text
 
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Run YOLO detection on BMS screenshots.")
+    ap.add_argument('sources', nargs='*',
+                    help="images, folders or glob patterns (none: show the default image)")
+    ap.add_argument('--weights', default=WEIGHTS)
+    ap.add_argument('--backend', choices=BACKENDS, default='pt',
+                    help="use an export of --weights made by export_quantized.py")
+    ap.add_argument('--imgsz', type=int, default=IMGSZ)
+    ap.add_argument('--batch', type=int, default=BATCH_SIZE)
+    ap.add_argument('--conf', type=float, default=0.25)
+    ap.add_argument('--iou', type=float, default=0.7)
+    ap.add_argument('--out', default='detections.jsonl', help="results file (.jsonl or .csv)")
+    ap.add_argument('--tile', type=int, default=None,
+                    help="predict full-resolution tiles of this size instead of downscaling")
+    ap.add_argument('--overlap', type=float, default=TILE_OVERLAP, help="tile overlap fraction")
+    ap.add_argument('--merge', choices=['nms', 'wbf'], default='nms',
+                    help="how tile detections are merged")
+    ap.add_argument('--save-dir', default=None, help="write annotated images to this folder")
+    ap.add_argument('--cache-dir', default=str(predict_cache.CACHE_DIR),
+                    help="raw detection cache for untiled batched runs")
+    ap.add_argument('--cache-size-mb', type=float, default=predict_cache.MAX_BYTES / 2**20)
+    ap.add_argument('--no-cache', action='store_true')
+    return ap.parse_args(argv)
 
-cv2.imshow('Annotated Image', image)
-cv2.waitKey(0)
-cv2.destroyAllWindows()
 
+def main(argv=None):
+    args = parse_args(argv)
+    model = LazyModel(args.weights, args.backend)
+    if not args.sources:
+        show_single(model, IMAGE, args.imgsz)
+        return
+    cache = weights_hash = None
+    if not args.no_cache and not args.tile:
+        if not model.path.exists():
+            raise SystemExit(f"{model.path} not found – run export_quantized.py first")
+        cache = predict_cache.ResultCache(args.cache_dir, int(args.cache_size_mb * 2**20))
+        weights_hash = predict_cache.weights_digest(model.path)
+    run_batched(model, args.sources, args.out, args.batch, args.imgsz, args.conf, args.iou,
+                args.tile, args.overlap, args.merge, args.save_dir, cache, weights_hash)
 
-print("Detected objects with confidence scores:")
-for box, score, class_id in zip(boxes.xyxy, scores, class_ids):
-    class_name = class_names[int(class_id)]  #get class name from class index
-    print(f"Class: {class_name}, Confidence: {score:.4f}, Box: {box}")
 
+if __name__ == '__main__':
+    main()